@@ -0,0 +1,158 @@
+"""
+In-process metrics for the COVID-19 Dashboard API, exposed in Prometheus text format
+"""
+from collections import defaultdict, deque
+from typing import Callable, Dict, Tuple
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Recent observations kept per series for quantile estimates
+RESERVOIR_SIZE = 2048
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Summary:
+    """Count, sum and p50/p95/p99 over a sliding window of recent observations"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._recent = deque(maxlen=RESERVOIR_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self._recent.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+
+class Metrics:
+    """Registry of counters, summaries and gauges rendered on /api/metrics"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._summaries: Dict[str, Dict[Labels, Summary]] = defaultdict(dict)
+        # Values read at scrape time, with their Prometheus type
+        self._callbacks: Dict[str, Tuple[Callable[[], float], str]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            summary = self._summaries[name].get(key)
+            if summary is None:
+                summary = self._summaries[name][key] = Summary()
+        summary.observe(value)
+
+    def gauge(self, name: str, read: Callable[[], float], help_text: str = ""):
+        """Register a gauge whose value is read at scrape time"""
+        self._register(name, read, "gauge", help_text)
+
+    def counter(self, name: str, read: Callable[[], float], help_text: str = ""):
+        """Register a counter kept elsewhere, whose running total is read at scrape time"""
+        self._register(name, read, "counter", help_text)
+
+    def _register(self, name: str, read: Callable[[], float], kind: str, help_text: str):
+        self._callbacks[name] = (read, kind)
+        if help_text:
+            self.describe(name, help_text)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            summaries = {name: dict(series) for name, series in self._summaries.items()}
+
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        for name, series in sorted(summaries.items()):
+            self._header(lines, name, "summary")
+            for labels, summary in sorted(series.items()):
+                for q, value in summary.quantiles().items():
+                    lines.append(f"{name}{_format_labels(labels + (('quantile', str(q)),))} {value:.6g}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {summary.total:.6g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+
+        for name, (read, kind) in sorted(self._callbacks.items()):
+            self._header(lines, name, kind)
+            lines.append(f"{name} {read():g}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+metrics = Metrics()
+metrics.describe("covid_http_requests_total", "HTTP requests by route, method and status")
+metrics.describe("covid_http_request_duration_seconds", "HTTP request latency by route")
+metrics.describe("covid_http_response_size_bytes", "HTTP response payload size by route")
+metrics.describe("covid_data_service_seconds", "Time spent inside DataService methods")
+
+
+# Sampled cProfile capture of DataService calls, enabled by COVID_PROFILE_SAMPLE_RATE > 0
+PROFILE_SAMPLE_RATE = float(os.environ.get("COVID_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("COVID_PROFILE_DIR", "profiles")
+_profile_lock = threading.Lock()
+
+
+def timed_call(func: Callable, *args):
+    """Call func and return (result, seconds), occasionally capturing a cProfile dump"""
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and _profile_lock.acquire(blocking=False):
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            result = profiler.runcall(func, *args)
+            elapsed = time.perf_counter() - start
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{func.__name__}-{time.time_ns()}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            logger.info(f"Wrote profile for {func.__name__} to {path}")
+            return result, elapsed
+        finally:
+            _profile_lock.release()
+
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
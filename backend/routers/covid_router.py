@@ -1,17 +1,88 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
 from ..services.data_service import DataService
+from ..services.executor import DataExecutor, DatasetNotReady, ExecutorOverloaded
+from ..services.loader import DatasetLoader
+from ..services.reloader import DatasetReloader
+from .response_cache import ResponseCache, cached_json, IMMUTABLE, REVALIDATE
+from .formats import FORMATS, encode_json, negotiate
+import asyncio
+import json
 import logging
+import os
+import pandas as pd
 
 router = APIRouter()
-data_service = DataService()
+# The dataset is loaded in the background by main.py's lifespan; the executor has no service until then
+loader = DatasetLoader(os.environ.get("COVID_DATA_PATH", "owid-covid-data.csv"))
+executor = DataExecutor.from_env()
+response_cache = ResponseCache()
+reloader = DatasetReloader.from_env(executor, on_swap=lambda service: response_cache.clear())
 logger = logging.getLogger(__name__)
 
+# Open server-sent playback streams
+playback_streams = 0
+
+# Frames built per executor call by the NDJSON map-data stream
+MAP_FRAME_CHUNK = int(os.environ.get("COVID_MAP_FRAME_CHUNK", "16"))
+
+def service_unavailable(e: ExecutorOverloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def require_ready():
+    """Reject data requests with a fast 503 until the initial load has finished"""
+    if executor.service is None:
+        raise service_unavailable(DatasetNotReady(f"Dataset is still loading ({loader.phase})"))
+
+READY = [Depends(require_ready)]
+
+def dated(service: DataService, *dates: Optional[str]) -> str:
+    """Cache policy of a response for specific dates
+
+    Only dates the dataset already covers can be immutable; a later date may be appended
+    by a reload. cached_json further requires the dataset version in the URL.
+    """
+    last = service.date_strings[-1]
+    for date in dates:
+        if date is None:
+            return REVALIDATE
+        try:
+            if pd.Timestamp(date).strftime("%Y-%m-%d") > last:
+                return REVALIDATE
+        except ValueError:
+            return REVALIDATE
+    return IMMUTABLE
+
+# Date bucketing and regional rollups accepted by the map, stats and timeline endpoints
+GRANULARITY = Query("day", pattern="^(day|week|month)$")
+GROUP_BY = Query("country", pattern="^(country|continent|who_region)$")
+
+@router.get("/health/live")
+async def liveness() -> Dict:
+    """Liveness probe: the process is up and serving the event loop"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness() -> Response:
+    """Readiness probe: 200 once the dataset is loaded, 503 with the load phase and progress before that"""
+    status = loader.status()
+    if executor.service is not None:
+        status.update(ready=True, version=executor.service.version)
+        return JSONResponse(status)
+    return JSONResponse(status, status_code=503, headers={"Retry-After": str(DatasetNotReady.retry_after)})
+
 @router.get("/test")
 async def test_endpoint() -> Dict:
     """Test endpoint to verify backend functionality"""
+    if executor.service is None:
+        return {
+            "status": "loading",
+            "message": loader.error or f"Dataset is still loading ({loader.phase})",
+            "data_loaded": False
+        }
     try:
-        dates = data_service.get_dates()
+        dates = executor.service.get_dates()
         return {
             "status": "success",
             "message": "Backend is working",
@@ -28,49 +99,314 @@ async def test_endpoint() -> Dict:
             "data_loaded": False
         }
 
-@router.get("/timeseries")
-async def get_timeseries() -> Dict:
-    """Get available dates for the timeline"""
+@router.get("/memory", dependencies=READY)
+async def get_memory() -> Dict:
+    """Bytes held by the loaded dataset per column and structure, and by the response cache"""
+    try:
+        report = await executor.run("memory_usage")
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    report["response_cache"] = {"entries": len(response_cache), "bytes": response_cache.nbytes}
+    return report
+
+@router.get("/timeseries", dependencies=READY)
+async def get_timeseries(request: Request, granularity: str = GRANULARITY) -> Response:
+    """Get available dates for the timeline (the first date of each bucket for weeks or months)"""
+    service = executor.service
+
+    async def get_dates():
+        return {"dates": await executor.run("get_dates", granularity, service=service)}
+
     try:
-        dates = data_service.get_dates()
-        return {"dates": dates}
+        return await cached_json(
+            response_cache, request, service.version, ("timeseries", granularity),
+            get_dates, REVALIDATE
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/global-stats")
-async def get_global_stats(date: Optional[str] = None):
-    """Get global COVID-19 statistics"""
+@router.get("/global-stats", dependencies=READY)
+async def get_global_stats(
+    request: Request,
+    date: Optional[str] = None,
+    metric: Optional[str] = None,
+    granularity: str = GRANULARITY,
+    group_by: str = GROUP_BY
+) -> Response:
+    """Get global COVID-19 statistics, optionally with the total and mean of any numeric OWID metric,
+    for the week or month containing `date` and broken down by region"""
     try:
-        stats = data_service.get_global_stats(date)
-        return stats
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("global-stats", date, metric, granularity, group_by),
+            lambda: executor.run("get_global_stats", date, metric, granularity, group_by, service=service),
+            dated(service, date)
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting global stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/country/{country_name}")
-async def get_country_data(country_name: str) -> Dict:
-    """Get COVID-19 data for a specific country"""
+@router.get("/stats", dependencies=READY)
+async def get_range_stats(
+    request: Request,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    country: Optional[str] = None
+) -> Response:
+    """Get new cases and deaths summed over any date range, with their daily mean and max, globally or for one country"""
+    try:
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("stats", start, end, country),
+            lambda: executor.run("get_range_stats", start, end, country, service=service), dated(service, end)
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/country/{country_name}", dependencies=READY)
+async def get_country_data(
+    country_name: str,
+    request: Request,
+    days: int = Query(30, ge=1, le=3650),
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to")
+) -> Response:
+    """Get COVID-19 data for a country by name or ISO code, over the last `days` dates or a from/to window"""
+    try:
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("country", country_name, days, start, end),
+            lambda: executor.run("get_country_data", country_name, days, start, end, service=service),
+            dated(service, end)
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        # An unknown country is not found; a window without any loaded date is a bad request
+        status = 400 if str(e).startswith("Empty date range") else 404
+        raise HTTPException(status_code=status, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/countries", dependencies=READY)
+async def get_countries(
+    request: Request,
+    names: str,
+    metric: str = "new_cases",
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    granularity: str = GRANULARITY,
+    format: Optional[str] = None
+) -> Response:
+    """Get date-aligned series of one metric for several countries (comma-separated names or ISO codes)"""
+    countries = [name for name in names.split(",") if name.strip()]
+    if not countries or len(countries) > 250:
+        raise HTTPException(status_code=400, detail="names must list between 1 and 250 countries")
+    fmt = negotiate(request, format)
+    media_type, encode, _ = FORMATS[fmt]
     try:
-        return data_service.get_country_data(country_name)
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version,
+            ("countries", tuple(countries), metric, start, end, granularity, fmt),
+            lambda: executor.run("get_countries_series", countries, metric, start, end, granularity, service=service),
+            dated(service, end), encode, media_type
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/top-countries")
-async def get_top_countries() -> Dict:
-    """Get top countries by cases and deaths"""
+@router.get("/top-countries", dependencies=READY)
+async def get_top_countries(
+    request: Request,
+    date: Optional[str] = None,
+    metric: Optional[str] = None,
+    n: int = Query(10, ge=1, le=250)
+) -> Response:
+    """Get top countries by cases and deaths, optionally for a date and with a ranking by any numeric OWID metric"""
     try:
-        return data_service.get_top_countries()
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("top-countries", date, metric, n),
+            lambda: executor.run("get_top_countries", date, metric, n, service=service), dated(service, date)
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/map-data/{date}")
-async def get_map_data(date: str) -> Dict:
-    """Get map data for a specific date"""
+@router.get("/map-data", dependencies=READY)
+async def get_map_data_range(
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    step: int = Query(1, ge=1),
+    format: Optional[str] = Query(None, pattern="^(json|columnar)$"),
+    metric: Optional[str] = None,
+    granularity: str = GRANULARITY,
+    group_by: str = GROUP_BY
+):
+    """Stream map data and global totals for a range of dates as NDJSON, one frame per line (or per week/month)
+
+    Frames are built through the executor MAP_FRAME_CHUNK at a time, so long ranges share its queue
+    limit and timeout with every other request. If the server becomes busy part way, the stream ends
+    with an {"error", "retry_after"} line.
+    """
+    # Every chunk is built from the dataset the labels came from
+    service = executor.service
+    try:
+        dates = await executor.run("playback_dates", start, end, step, granularity, metric, group_by, service=service)
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines() -> AsyncIterator[str]:
+        for i in range(0, len(dates), MAP_FRAME_CHUNK):
+            chunk = dates[i:i + MAP_FRAME_CHUNK]
+            try:
+                frames = await executor.run(
+                    "get_map_frames", chunk, format == "columnar", metric, granularity, group_by, service=service
+                )
+            except ExecutorOverloaded as e:
+                yield json.dumps({"error": str(e), "retry_after": e.retry_after}) + "\n"
+                return
+            for frame in frames:
+                yield json.dumps(frame, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/map-data/{date}/delta", dependencies=READY)
+async def get_map_delta(date: str, request: Request, base: str) -> Response:
+    """Get only the countries whose map data changed between `base` and `date`, plus global totals"""
+    try:
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("map-delta", base, date),
+            lambda: executor.run("get_map_delta", base, date, service=service),
+            dated(service, base, date), encode_json
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/map-data/{date}", dependencies=READY)
+async def get_map_data(
+    date: str,
+    request: Request,
+    format: Optional[str] = None,
+    metric: Optional[str] = None,
+    granularity: str = GRANULARITY,
+    group_by: str = GROUP_BY
+) -> Response:
+    """Get map data for a specific date, as row JSON or a negotiated columnar/binary format
+
+    `metric` colours the map by any numeric OWID column instead of cases per million,
+    `granularity` returns the week or month containing the date and `group_by` rolls
+    countries up into continents or WHO regions.
+    """
+    fmt = negotiate(request, format)
+    media_type, encode, _ = FORMATS[fmt]
+    method = "get_map_data" if fmt == "json" else "get_map_columns"
     try:
-        return data_service.get_map_data(date)
+        service = executor.service
+        return await cached_json(
+            response_cache, request, service.version, ("map-data", date, fmt, metric, granularity, group_by),
+            lambda: executor.run(method, date, metric, granularity, group_by, service=service),
+            dated(service, date), encode, media_type
+        )
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _frame_bytes(date: str, granularity: str, group_by: str, metric: Optional[str]) -> bytes:
+    """Serialized playback frame, shared by every viewer through the response cache"""
+    service = executor.service
+
+    async def compute() -> bytes:
+        return encode_json(await executor.run("get_map_frame", date, granularity, group_by, metric, service=service))
+
+    return await response_cache.get_or_compute(
+        (service.version, ("frame", date, granularity, group_by, metric)), compute
+    )
+
+async def _playback_events(dates: List[str], speed: float, granularity: str, group_by: str,
+                           metric: Optional[str]) -> AsyncIterator[bytes]:
+    """Push one frame event per date at `speed` frames per second
+
+    Each frame is only produced after the previous one was handed to the server, so a slow
+    client slows the stream down instead of making frames pile up in memory.
+    """
+    global playback_streams
+    playback_streams += 1
+    loop = asyncio.get_running_loop()
+    interval = 1 / speed
+    deadline = loop.time()
+    try:
+        for date in dates:
+            try:
+                body = await _frame_bytes(date, granularity, group_by, metric)
+            except ExecutorOverloaded as e:
+                yield f"event: unavailable\nretry: {e.retry_after * 1000}\ndata: {json.dumps(str(e))}\n\n".encode()
+                return
+            yield b"id: " + date.encode() + b"\nevent: frame\ndata: " + body + b"\n\n"
+
+            # Keep the pace, without bursting to catch up after a slow client
+            deadline = max(deadline + interval, loop.time())
+            await asyncio.sleep(deadline - loop.time())
+        yield b"event: end\ndata: {}\n\n"
+    finally:
+        playback_streams -= 1
+
+@router.get("/playback", dependencies=READY)
+async def playback(
+    request: Request,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    speed: float = Query(3.0, gt=0, le=60),
+    step: int = Query(1, ge=1),
+    metric: Optional[str] = None,
+    granularity: str = GRANULARITY,
+    group_by: str = GROUP_BY
+):
+    """Server-sent event stream of columnar map frames (map data plus global totals) for timeline playback
+
+    Reconnecting clients send Last-Event-ID and resume after the last frame they received.
+    """
+    try:
+        dates = await executor.run("playback_dates", start, end, step, granularity, metric, group_by)
+    except ExecutorOverloaded as e:
+        raise service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id in dates:
+        dates = dates[dates.index(last_event_id) + 1:]
+
+    return StreamingResponse(
+        _playback_events(dates, speed, granularity, group_by, metric),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,78 @@
+from fastapi import HTTPException, Request
+from typing import Callable, Dict, Optional, Tuple
+import io
+import json
+import numpy as np
+
+# Binary formats are optional; they are only offered when their library is installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+COLUMNAR_JSON = "application/vnd.covid.columnar+json"
+MSGPACK = "application/x-msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+
+def _plain(value):
+    """Convert NumPy arrays to lists so the payload can go through json/msgpack"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def encode_json(payload: Dict) -> bytes:
+    return json.dumps(_plain(payload), separators=(",", ":")).encode()
+
+
+def encode_msgpack(payload: Dict) -> bytes:
+    return msgpack.packb(_plain(payload), use_bin_type=True)
+
+
+def encode_arrow(payload: Dict) -> bytes:
+    """Arrow IPC stream of the columns, with the remaining top-level fields as schema metadata"""
+    columns = payload["columns"]
+    metadata = {k: v if isinstance(v, str) else json.dumps(v) for k, v in payload.items() if k != "columns"}
+    batch = pa.record_batch([pa.array(values) for values in columns.values()], names=list(columns))
+    batch = batch.replace_schema_metadata(metadata)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+
+# format name -> (media type, encoder, available)
+FORMATS: Dict[str, Tuple[str, Callable[[Dict], bytes], bool]] = {
+    "json": ("application/json", encode_json, True),
+    "columnar": (COLUMNAR_JSON, encode_json, True),
+    "msgpack": (MSGPACK, encode_msgpack, msgpack is not None),
+    "arrow": (ARROW, encode_arrow, pa is not None),
+}
+MEDIA_TYPES = {media_type: name for name, (media_type, _, _) in FORMATS.items()}
+MEDIA_TYPES["application/msgpack"] = "msgpack"
+
+
+def negotiate(request: Request, requested: Optional[str] = None) -> str:
+    """Pick a response format from a ?format= override or the Accept header, defaulting to row JSON"""
+    if requested is None:
+        for part in request.headers.get("accept", "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in MEDIA_TYPES and FORMATS[MEDIA_TYPES[media_type]][2]:
+                requested = MEDIA_TYPES[media_type]
+                break
+        else:
+            return "json"
+
+    if requested not in FORMATS:
+        raise HTTPException(status_code=406, detail=f"Unknown format {requested}, expected one of {list(FORMATS)}")
+    if not FORMATS[requested][2]:
+        raise HTTPException(status_code=406, detail=f"Format {requested} is not available on this server")
+    return requested
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Responses for loaded dates under a versioned URL (?v=<dataset version>) never change
+IMMUTABLE = "public, max-age=31536000, immutable"
+# "Latest" responses move when a new dataset is loaded, so let clients revalidate
+REVALIDATE = "public, max-age=300"
+
+
+class ResponseCache:
+    """Bounded LRU of serialized JSON responses, keyed by dataset version and request
+
+    Misses are single-flight: while a body is being computed for a key, later requests for
+    the same key wait for that computation instead of starting their own.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Hashable, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Cached body for a key, computing it once however many callers ask concurrently"""
+        body = self.get(key)
+        if body is not None:
+            return body
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting caller does not cancel the work the others wait for
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        # A task dropped by clear() was computed for data that has since been replaced
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def clear(self):
+        """Drop every entry, and keep computations already running from storing their results"""
+        self._entries.clear()
+        self._inflight.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the cached response bodies"""
+        return sum(len(body) for body in list(self._entries.values()))
+
+
+def make_etag(version: str, key: Hashable) -> str:
+    """Strong ETag derived from the dataset version and the request key"""
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against our ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def serialize(payload: Dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+async def cached_json(
+    cache: ResponseCache,
+    request: Request,
+    version: str,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Dict]],
+    cache_control: str = IMMUTABLE,
+    encode: Callable[[Dict], bytes] = serialize,
+    media_type: str = "application/json"
+) -> Response:
+    """Serve an encoded response from the cache, answering If-None-Match with 304"""
+    etag = make_etag(version, key)
+    if cache_control == IMMUTABLE and request.query_params.get("v") != version:
+        # A reload can change what an unversioned URL returns, so only ?v=<dataset version> is immutable
+        cache_control = REVALIDATE
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    async def compute_body() -> bytes:
+        return encode(await compute())
+
+    body = await cache.get_or_compute((version, key), compute_body)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,109 @@
+"""
+Temporal downsampling and regional rollups of the dates x countries cube
+"""
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = ("day", "week", "month")
+GROUPINGS = ("country", "continent", "who_region")
+
+# WHO region of each served country; Liechtenstein, Taiwan and the Holy See are not
+# WHO member states and are placed by geography
+WHO_REGIONS = {
+    "AFR": [
+        'DZA', 'AGO', 'BEN', 'BWA', 'BFA', 'BDI', 'CMR', 'CPV', 'CAF', 'TCD', 'COM', 'COG', 'CIV', 'GNQ',
+        'ERI', 'ETH', 'GAB', 'GMB', 'GHA', 'GIN', 'GNB', 'KEN', 'LSO', 'LBR', 'MDG', 'MWI', 'MLI', 'MRT',
+        'MUS', 'MOZ', 'NAM', 'NER', 'NGA', 'RWA', 'STP', 'SEN', 'SYC', 'SLE', 'ZAF', 'SSD', 'TGO', 'UGA',
+        'TZA', 'ZMB', 'ZWE'
+    ],
+    "AMR": [
+        'ATG', 'ARG', 'BHS', 'BRB', 'BLZ', 'BOL', 'BRA', 'CAN', 'CHL', 'COL', 'CRI', 'CUB', 'DMA', 'DOM',
+        'ECU', 'SLV', 'GRD', 'GTM', 'GUY', 'HTI', 'HND', 'JAM', 'MEX', 'NIC', 'PAN', 'PRY', 'PER', 'KNA',
+        'LCA', 'VCT', 'SUR', 'TTO', 'USA', 'URY', 'VEN'
+    ],
+    "SEAR": ['BGD', 'BTN', 'PRK', 'IND', 'IDN', 'MDV', 'MMR', 'NPL', 'LKA', 'THA', 'TLS'],
+    "EUR": [
+        'ALB', 'AND', 'ARM', 'AUT', 'AZE', 'BLR', 'BEL', 'BIH', 'BGR', 'HRV', 'CYP', 'CZE', 'DNK', 'EST',
+        'FIN', 'FRA', 'GEO', 'DEU', 'GRC', 'HUN', 'ISL', 'IRL', 'ISR', 'ITA', 'KAZ', 'KGZ', 'LVA', 'LIE',
+        'LTU', 'LUX', 'MLT', 'MCO', 'MNE', 'NLD', 'NOR', 'POL', 'PRT', 'MDA', 'ROU', 'RUS', 'SMR', 'SRB',
+        'SVK', 'SVN', 'ESP', 'SWE', 'CHE', 'TJK', 'TUR', 'TKM', 'UKR', 'GBR', 'UZB', 'VAT'
+    ],
+    "EMR": [
+        'AFG', 'BHR', 'DJI', 'EGY', 'IRN', 'IRQ', 'JOR', 'KWT', 'LBN', 'LBY', 'MAR', 'OMN', 'PAK', 'QAT',
+        'SAU', 'SOM', 'SDN', 'SYR', 'TUN', 'ARE', 'YEM'
+    ],
+    "WPR": [
+        'AUS', 'BRN', 'KHM', 'CHN', 'FJI', 'JPN', 'KIR', 'LAO', 'MYS', 'MHL', 'FSM', 'MNG', 'NRU', 'NZL',
+        'PLW', 'PNG', 'PHL', 'KOR', 'WSM', 'SGP', 'SLB', 'TWN', 'TON', 'TUV', 'VUT', 'VNM'
+    ],
+}
+WHO_REGION_OF = {code: region for region, codes in WHO_REGIONS.items() for code in codes}
+
+
+class CubeView:
+    """The cube at one granularity and grouping: rows are date buckets, columns countries or regions"""
+
+    def __init__(self, cube: np.ndarray, dates: List[str], ends: List[str], names: np.ndarray,
+                 codes: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None,
+                 starts: Optional[np.ndarray] = None):
+        self.cube = cube
+        self.dates = dates      # first loaded date of each bucket, used as its label
+        self.ends = ends        # last loaded date of each bucket
+        self.names = names
+        self.codes = codes      # map codes for countries, None for regions
+        self.counts = counts    # countries reporting per bucket and region, None for countries
+        self.starts = starts    # first daily row of each bucket, None for daily views
+        self.metrics: Dict[str, np.ndarray] = {}
+
+    def position(self, date: str) -> Optional[int]:
+        """Row of the bucket containing a date, or None if no loaded date falls in it"""
+        position = bisect_right(self.dates, date) - 1
+        if position < 0 or date > self.ends[position]:
+            return None
+        return position
+
+
+def bucket_starts(date_strings: List[str], granularity: str) -> np.ndarray:
+    """First row of each week (Monday to Sunday) or calendar month in a sorted list of dates"""
+    freq = "W-SUN" if granularity == "week" else "M"
+    keys = pd.DatetimeIndex(date_strings).to_period(freq).asi8
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def reduce_dates(values: np.ndarray, starts: np.ndarray, how: str) -> np.ndarray:
+    """Combine consecutive rows of a dates-first array into buckets beginning at `starts`
+
+    "sum" adds flows such as daily new cases, "max" keeps the latest level of a cumulative
+    metric and "mean" averages anything else. Buckets without a single value stay NaN.
+    """
+    # Sums of float32 counts are accumulated in float64
+    values = np.asarray(values, dtype=np.float64)
+    present = np.add.reduceat((~np.isnan(values)).astype(np.int32), starts, axis=0)
+    if how == "max":
+        return np.fmax.reduceat(values, starts, axis=0)
+    reduced = np.add.reduceat(np.nan_to_num(values), starts, axis=0)
+    if how == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            reduced = reduced / present
+    reduced[present == 0] = np.nan
+    return reduced
+
+
+def group_columns(labels: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Sorted group names, a column order that makes groups contiguous and each group's first column"""
+    names, group_ids = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    order = np.argsort(group_ids, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(group_ids[order]) != 0])
+    return names.tolist(), order, starts
+
+
+def reduce_groups(values: np.ndarray, order: np.ndarray, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum a dates x countries (x metrics) array over country groups; also returns reporting counts"""
+    values = np.asarray(values[:, order], dtype=np.float64)
+    present = ~np.isnan(values if values.ndim == 2 else values[:, :, 0])
+    counts = np.add.reduceat(present.astype(np.int32), starts, axis=1)
+    summed = np.add.reduceat(np.nan_to_num(values), starts, axis=1)
+    summed[counts == 0] = np.nan
+    return summed, counts
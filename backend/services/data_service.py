@@ -1,507 +1,1275 @@
 import pandas as pd
+import numpy as np
+import io
 import logging
-from typing import Optional, Dict
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Callable, Optional, Dict, List
+from .snapshot import load_snapshot, save_snapshot, default_snapshot_path, dataset_version, read_appended, source_fingerprint
+from . import shared_store
+from .derived import DERIVED_LOOKBACK, DERIVED_METRICS, compute_derived
+from .range_stats import RangeMax, prefix_sums
+from .memory import MetricCube, array_usage, date_ordinals, downcast_floats, index_type, narrow, object_usage, ordinal_dates
+from .aggregation import CubeView, GRANULARITIES, GROUPINGS, WHO_REGION_OF, bucket_starts, reduce_dates, group_columns, reduce_groups
 
 logger = logging.getLogger(__name__)
 
+# Map ISO alpha-3 codes to the ISO numeric ids used by the world-atlas topojson
+COUNTRY_CODE_MAP = {
+    # North America
+    'USA': '840',  # United States
+    'CAN': '124',  # Canada
+    'MEX': '484',  # Mexico
+    
+    # South America
+    'ARG': '032',  # Argentina
+    'BOL': '068',  # Bolivia
+    'BRA': '076',  # Brazil
+    'CHL': '152',  # Chile
+    'COL': '170',  # Colombia
+    'ECU': '218',  # Ecuador
+    'GUY': '328',  # Guyana
+    'PER': '604',  # Peru
+    'PRY': '600',  # Paraguay
+    'SUR': '740',  # Suriname
+    'URY': '858',  # Uruguay
+    'VEN': '862',  # Venezuela
+    
+    # Europe
+    'ALB': '008',  # Albania
+    'AND': '020',  # Andorra
+    'AUT': '040',  # Austria
+    'BEL': '056',  # Belgium
+    'BIH': '070',  # Bosnia and Herzegovina
+    'BGR': '100',  # Bulgaria
+    'HRV': '191',  # Croatia
+    'CZE': '203',  # Czech Republic
+    'DNK': '208',  # Denmark
+    'EST': '233',  # Estonia
+    'FIN': '246',  # Finland
+    'FRA': '250',  # France
+    'DEU': '276',  # Germany
+    'GRC': '300',  # Greece
+    'HUN': '348',  # Hungary
+    'ISL': '352',  # Iceland
+    'IRL': '372',  # Ireland
+    'ITA': '380',  # Italy
+    'LVA': '428',  # Latvia
+    'LIE': '438',  # Liechtenstein
+    'LTU': '440',  # Lithuania
+    'LUX': '442',  # Luxembourg
+    'MLT': '470',  # Malta
+    'MDA': '498',  # Moldova
+    'MCO': '492',  # Monaco
+    'MNE': '499',  # Montenegro
+    'NLD': '528',  # Netherlands
+    'MKD': '807',  # North Macedonia
+    'NOR': '578',  # Norway
+    'POL': '616',  # Poland
+    'PRT': '620',  # Portugal
+    'ROU': '642',  # Romania
+    'RUS': '643',  # Russia
+    'SMR': '674',  # San Marino
+    'SRB': '688',  # Serbia
+    'SVK': '703',  # Slovakia
+    'SVN': '705',  # Slovenia
+    'ESP': '724',  # Spain
+    'SWE': '752',  # Sweden
+    'CHE': '756',  # Switzerland
+    'UKR': '804',  # Ukraine
+    'GBR': '826',  # United Kingdom
+    'VAT': '336',  # Vatican City
+    
+    # Africa
+    'DZA': '012',  # Algeria
+    'AGO': '024',  # Angola
+    'BEN': '204',  # Benin
+    'BWA': '072',  # Botswana
+    'BFA': '854',  # Burkina Faso
+    'BDI': '108',  # Burundi
+    'CMR': '120',  # Cameroon
+    'CPV': '132',  # Cape Verde
+    'CAF': '140',  # Central African Republic
+    'TCD': '148',  # Chad
+    'COM': '174',  # Comoros
+    'COG': '178',  # Congo
+    'COD': '180',  # Democratic Republic of the Congo
+    'DJI': '262',  # Djibouti
+    'EGY': '818',  # Egypt
+    'GNQ': '226',  # Equatorial Guinea
+    'ERI': '232',  # Eritrea
+    'ETH': '231',  # Ethiopia
+    'GAB': '266',  # Gabon
+    'GMB': '270',  # Gambia
+    'GHA': '288',  # Ghana
+    'GIN': '324',  # Guinea
+    'GNB': '624',  # Guinea-Bissau
+    'KEN': '404',  # Kenya
+    'LSO': '426',  # Lesotho
+    'LBR': '430',  # Liberia
+    'LBY': '434',  # Libya
+    'MDG': '450',  # Madagascar
+    'MWI': '454',  # Malawi
+    'MLI': '466',  # Mali
+    'MRT': '478',  # Mauritania
+    'MUS': '480',  # Mauritius
+    'MAR': '504',  # Morocco
+    'MOZ': '508',  # Mozambique
+    'NAM': '516',  # Namibia
+    'NER': '562',  # Niger
+    'NGA': '566',  # Nigeria
+    'RWA': '646',  # Rwanda
+    'STP': '678',  # Sao Tome and Principe
+    'SEN': '686',  # Senegal
+    'SYC': '690',  # Seychelles
+    'SLE': '694',  # Sierra Leone
+    'SOM': '706',  # Somalia
+    'ZAF': '710',  # South Africa
+    'SSD': '728',  # South Sudan
+    'SDN': '729',  # Sudan
+    'SWZ': '748',  # Eswatini
+    'TZA': '834',  # Tanzania
+    'TGO': '768',  # Togo
+    'TUN': '788',  # Tunisia
+    'UGA': '800',  # Uganda
+    'ZMB': '894',  # Zambia
+    'ZWE': '716',  # Zimbabwe
+    
+    # Asia
+    'AFG': '004',  # Afghanistan
+    'ARM': '051',  # Armenia
+    'AZE': '031',  # Azerbaijan
+    'BHR': '048',  # Bahrain
+    'BGD': '050',  # Bangladesh
+    'BTN': '064',  # Bhutan
+    'BRN': '096',  # Brunei
+    'KHM': '116',  # Cambodia
+    'CHN': '156',  # China
+    'CYP': '196',  # Cyprus
+    'GEO': '268',  # Georgia
+    'IND': '356',  # India
+    'IDN': '360',  # Indonesia
+    'IRN': '364',  # Iran
+    'IRQ': '368',  # Iraq
+    'ISR': '376',  # Israel
+    'JOR': '400',  # Jordan
+    'KAZ': '398',  # Kazakhstan
+    'KWT': '414',  # Kuwait
+    'KGZ': '417',  # Kyrgyzstan
+    'LAO': '418',  # Laos
+    'LBN': '422',  # Lebanon
+    'MYS': '458',  # Malaysia
+    'MDV': '462',  # Maldives
+    'MNG': '496',  # Mongolia
+    'MMR': '104',  # Myanmar
+    'NPL': '524',  # Nepal
+    'OMN': '512',  # Oman
+    'PAK': '586',  # Pakistan
+    'PSE': '275',  # Palestine
+    'PHL': '608',  # Philippines
+    'QAT': '634',  # Qatar
+    'SAU': '682',  # Saudi Arabia
+    'SGP': '702',  # Singapore
+    'LKA': '144',  # Sri Lanka
+    'SYR': '760',  # Syria
+    'TJK': '762',  # Tajikistan
+    'THA': '764',  # Thailand
+    'TLS': '626',  # Timor-Leste
+    'TUR': '792',  # Turkey
+    'TKM': '795',  # Turkmenistan
+    'ARE': '784',  # United Arab Emirates
+    'UZB': '860',  # Uzbekistan
+    'VNM': '704',  # Vietnam
+    'YEM': '887',  # Yemen
+    
+    # Oceania
+    'AUS': '036',  # Australia
+    'FJI': '242',  # Fiji
+    'KIR': '296',  # Kiribati
+    'MHL': '584',  # Marshall Islands
+    'FSM': '583',  # Micronesia
+    'NRU': '520',  # Nauru
+    'NZL': '554',  # New Zealand
+    'PLW': '585',  # Palau
+    'PNG': '598',  # Papua New Guinea
+    'WSM': '882',  # Samoa
+    'SLB': '090',  # Solomon Islands
+    'TON': '776',  # Tonga
+    'TUV': '798',  # Tuvalu
+    'VUT': '548'   # Vanuatu
+}
+
+# Sovereign states served by the dashboard
+SOVEREIGN_STATES = [
+    'AFG', 'ALB', 'DZA', 'AND', 'AGO', 'ATG', 'ARG', 'ARM', 'AUS', 'AUT', 'AZE', 'BHS', 'BHR', 'BGD', 'BRB', 'BLR', 'BEL', 'BLZ', 'BEN', 'BTN', 'BOL', 'BIH', 'BWA', 'BRA', 'BRN', 'BGR', 'BFA', 'BDI', 'KHM', 'CMR', 'CAN', 'CPV', 'CAF', 'TCD', 'CHL', 'CHN', 'COL', 'COM', 'COG', 'CRI', 'CIV', 'HRV', 'CUB', 'CYP', 'CZE', 'DNK', 'DJI', 'DMA', 'DOM', 'ECU', 'EGY', 'SLV', 'GNQ', 'ERI', 'EST', 'ETH', 'FJI', 'FIN', 'FRA', 'GAB', 'GMB', 'GEO', 'DEU', 'GHA', 'GRC', 'GRD', 'GTM', 'GIN', 'GNB', 'GUY', 'HTI', 'HND', 'HUN', 'ISL', 'IND', 'IDN', 'IRN', 'IRQ', 'IRL', 'ISR', 'ITA', 'JAM', 'JPN', 'JOR', 'KAZ', 'KEN', 'KIR', 'PRK', 'KOR', 'KWT', 'KGZ', 'LAO', 'LVA', 'LBN', 'LSO', 'LBR', 'LBY', 'LIE', 'LTU', 'LUX', 'MDG', 'MWI', 'MYS', 'MDV', 'MLI', 'MLT', 'MHL', 'MRT', 'MUS', 'MEX', 'FSM', 'MDA', 'MCO', 'MNG', 'MNE', 'MAR', 'MOZ', 'MMR', 'NAM', 'NRU', 'NPL', 'NLD', 'NZL', 'NIC', 'NER', 'NGA', 'NOR', 'OMN', 'PAK', 'PLW', 'PAN', 'PNG', 'PRY', 'PER', 'PHL', 'POL', 'PRT', 'QAT', 'ROU', 'RUS', 'RWA', 'KNA', 'LCA', 'VCT', 'WSM', 'SMR', 'STP', 'SAU', 'SEN', 'SRB', 'SYC', 'SLE', 'SGP', 'SVK', 'SVN', 'SLB', 'SOM', 'ZAF', 'SSD', 'ESP', 'LKA', 'SDN', 'SUR', 'SWE', 'CHE', 'SYR', 'TWN', 'TJK', 'TZA', 'THA', 'TLS', 'TGO', 'TON', 'TTO', 'TUN', 'TUR', 'TKM', 'TUV', 'UGA', 'UKR', 'ARE', 'GBR', 'USA', 'URY', 'UZB', 'VUT', 'VAT', 'VEN', 'VNM', 'YEM', 'ZMB', 'ZWE'
+]
+
+# Columns read from the OWID CSV
+COLUMNS = [
+    "location", "date", "total_cases", "total_deaths",
+    "new_cases", "new_deaths", "population",
+    "total_cases_per_million", "total_deaths_per_million",
+    "iso_code"
+]
+TEXT_COLUMNS = ["location", "date", "iso_code"]
+
+# Hard cutoff date for the data
+CUTOFF_DATE = pd.Timestamp('2023-12-31')
+
+# Metrics stored in the date x country cube, in cube order
+CUBE_METRICS = [
+    "total_cases", "total_deaths", "new_cases", "new_deaths", "population",
+    "total_cases_per_million", "total_deaths_per_million"
+]
+TOTAL_CASES = CUBE_METRICS.index("total_cases")
+TOTAL_DEATHS = CUBE_METRICS.index("total_deaths")
+CASES_PER_MILLION = CUBE_METRICS.index("total_cases_per_million")
+DEATHS_PER_MILLION = CUBE_METRICS.index("total_deaths_per_million")
+NEW_CASES = CUBE_METRICS.index("new_cases")
+NEW_DEATHS = CUBE_METRICS.index("new_deaths")
+POPULATION = CUBE_METRICS.index("population")
+
+# Cube metrics counted per day, summed when dates are bucketed (the rest are cumulative)
+FLOW_METRICS = ["new_cases", "new_deaths"]
+FLOW_INDEXES = [CUBE_METRICS.index(metric) for metric in FLOW_METRICS]
+
+# Fields of each map entry, in response order
+MAP_FIELDS = ["country", "iso_code", "cases", "deaths", "cases_per_million", "deaths_per_million", "severity"]
+
+# Columns of the full OWID file that are not numeric metrics
+OWID_TEXT_COLUMNS = ["iso_code", "continent", "location", "date", "tests_units"]
+
+# Metric that drives map severity unless another one is requested
+DEFAULT_MAP_METRIC = "total_cases_per_million"
+
+# Metrics with a precomputed per-date ranking
+RANKED_METRICS = [
+    "total_cases", "total_deaths", "new_cases", "new_deaths",
+    "total_cases_per_million", "total_deaths_per_million"
+]
+
+# Countries need at least this many cases to show on the map (gray below)
+MIN_CASES = 10
+
 class DataService:
-    def __init__(self, csv_path="owid-covid-data.csv"):
+    def __init__(self, csv_path="owid-covid-data.csv", snapshot_path=None, previous: Optional["DataService"] = None,
+                 store_root: Optional[str] = None, progress: Optional[Callable[[str, float], None]] = None):
         self.csv_path = csv_path
+        self.snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+        self.store_root = store_root or shared_store.default_store_root(csv_path)
         self.df = None
+        self.version = None
+        # Size and SHA-1 of the CSV this dataset was built from, to recognise a later file that only appends rows
+        self.source_size: Optional[int] = None
+        self.source_digest: Optional[str] = None
         self.date_strings = []
-        self.load_data()
+        self.date_positions = {}
+        self.cube = None
+        self.countries = []
+        self.iso_codes = []
+        self.map_codes = []
+        self.country_positions = {}
+        self.code_positions = {}
+        self.country_spans = None
+        self.country_array = None
+        self.map_code_array = None
+        self.rankings = {}
+        self.ranked_counts = {}
+        # Rolling averages, growth rates, Rt proxy and doubling times (dates x countries)
+        self.derived: Dict[str, np.ndarray] = {}
+        # Running totals of the flow metrics, (dates + 1) x countries x flows, for range sums
+        self.prefix_sums = None
+        # Sparse tables for range maxima, built on first use: (flow, per country or global) -> table
+        self.range_max: Dict[tuple, RangeMax] = {}
+        # Metrics outside the cube, read from the CSV on first use (dates x countries)
+        self.metric_arrays: Dict[str, np.ndarray] = {}
+        # Weekly/monthly and regional views of the cube, keyed by (granularity, group_by)
+        self.views: Dict[tuple, CubeView] = {}
+        self._lazy_lock = threading.RLock()
+        self._available_metrics: Optional[List[str]] = None
+        self.progress = progress
+        self.load_data(previous)
 
-    def load_data(self):
+    def load_data(self, previous: Optional["DataService"] = None):
         try:
-            logger.info(f"Loading CSV file from {self.csv_path}")
-            self.df = pd.read_csv(self.csv_path)
-            logger.info(f"Successfully loaded CSV with {len(self.df)} rows")
-            logger.info(f"Initial columns: {self.df.columns.tolist()}")
-            
-            # Filter for sovereign states only
-            sovereign_states = [
-                'AFG', 'ALB', 'DZA', 'AND', 'AGO', 'ATG', 'ARG', 'ARM', 'AUS', 'AUT', 'AZE', 'BHS', 'BHR', 'BGD', 'BRB', 'BLR', 'BEL', 'BLZ', 'BEN', 'BTN', 'BOL', 'BIH', 'BWA', 'BRA', 'BRN', 'BGR', 'BFA', 'BDI', 'KHM', 'CMR', 'CAN', 'CPV', 'CAF', 'TCD', 'CHL', 'CHN', 'COL', 'COM', 'COG', 'CRI', 'CIV', 'HRV', 'CUB', 'CYP', 'CZE', 'DNK', 'DJI', 'DMA', 'DOM', 'ECU', 'EGY', 'SLV', 'GNQ', 'ERI', 'EST', 'ETH', 'FJI', 'FIN', 'FRA', 'GAB', 'GMB', 'GEO', 'DEU', 'GHA', 'GRC', 'GRD', 'GTM', 'GIN', 'GNB', 'GUY', 'HTI', 'HND', 'HUN', 'ISL', 'IND', 'IDN', 'IRN', 'IRQ', 'IRL', 'ISR', 'ITA', 'JAM', 'JPN', 'JOR', 'KAZ', 'KEN', 'KIR', 'PRK', 'KOR', 'KWT', 'KGZ', 'LAO', 'LVA', 'LBN', 'LSO', 'LBR', 'LBY', 'LIE', 'LTU', 'LUX', 'MDG', 'MWI', 'MYS', 'MDV', 'MLI', 'MLT', 'MHL', 'MRT', 'MUS', 'MEX', 'FSM', 'MDA', 'MCO', 'MNG', 'MNE', 'MAR', 'MOZ', 'MMR', 'NAM', 'NRU', 'NPL', 'NLD', 'NZL', 'NIC', 'NER', 'NGA', 'NOR', 'OMN', 'PAK', 'PLW', 'PAN', 'PNG', 'PRY', 'PER', 'PHL', 'POL', 'PRT', 'QAT', 'ROU', 'RUS', 'RWA', 'KNA', 'LCA', 'VCT', 'WSM', 'SMR', 'STP', 'SAU', 'SEN', 'SRB', 'SYC', 'SLE', 'SGP', 'SVK', 'SVN', 'SLB', 'SOM', 'ZAF', 'SSD', 'ESP', 'LKA', 'SDN', 'SUR', 'SWE', 'CHE', 'SYR', 'TWN', 'TJK', 'TZA', 'THA', 'TLS', 'TGO', 'TON', 'TTO', 'TUN', 'TUR', 'TKM', 'TUV', 'UGA', 'UKR', 'ARE', 'GBR', 'USA', 'URY', 'UZB', 'VUT', 'VAT', 'VEN', 'VNM', 'YEM', 'ZMB', 'ZWE'
-            ]
-            
-            # First filter for sovereign states and non-null values
-            self.df = self.df[
-                (self.df["iso_code"].isin(sovereign_states)) &
-                (self.df["location"].notna()) &
-                (self.df["iso_code"].notna())
-            ].copy()
-            
-            logger.info(f"After filtering sovereign states: {len(self.df)} rows")
-            
-            # Select relevant columns and clean data
-            columns = [
-                "location", "date", "total_cases", "total_deaths", 
-                "new_cases", "new_deaths", "population", 
-                "total_cases_per_million", "total_deaths_per_million",
-                "iso_code"
-            ]
-            
-            # Check if all required columns exist
-            missing_columns = [col for col in columns if col not in self.df.columns]
-            if missing_columns:
-                logger.error(f"Missing columns in CSV: {missing_columns}")
-                raise ValueError(f"Missing required columns: {missing_columns}")
-            
-            self.df = self.df[columns].copy()
-            
-            # Clean data - convert to numeric and handle missing values
-            for col in self.df.columns:
-                if col not in ["location", "date", "iso_code"]:
-                    self.df[col] = pd.to_numeric(self.df[col], errors='coerce')
-                    # Fill NaN with 0 only for numeric columns
-                    self.df[col] = self.df[col].fillna(0)
-                    logger.info(f"Column {col} - Non-zero values: {(self.df[col] > 0).sum()}")
-
-            # Convert date to datetime
-            self.df['date'] = pd.to_datetime(self.df['date'])
-            
-            # Set a hard cutoff date for the data
-            cutoff_date = pd.to_datetime('2023-12-31')
-            self.df = self.df[self.df['date'] <= cutoff_date].copy()
-            
-            # Get the latest date with non-zero data (up to cutoff)
-            latest_date = self.df[self.df['total_cases'] > 0]['date'].max()
-            logger.info(f"Latest date with non-zero data: {latest_date}")
-            
-            # Update the available dates for the timeline to only include up to latest_date
-            unique_dates = sorted(self.df['date'].unique())
-            self.date_strings = [d.strftime("%Y-%m-%d") for d in unique_dates]
-            logger.info(f"Date range: {self.date_strings[0]} to {self.date_strings[-1]}")
-
-            # Log some basic statistics
-            unique_countries = self.df['location'].nunique()
-            logger.info(f"Number of unique countries: {unique_countries}")
-            
-            # Log all countries and their latest data
-            latest_data = self.df[self.df['date'] == latest_date]
-            latest_data = latest_data[latest_data['total_cases'] > 0]  # Only include countries with cases
-            logger.info(f"Latest date: {latest_date}")
-            logger.info(f"Countries with data: {', '.join(sorted(latest_data['location'].unique()))}")
-            logger.info(f"Number of countries with data: {len(latest_data)}")
-            
-            # Log data completeness
-            for country in sorted(latest_data['location'].unique()):
-                country_data = latest_data[latest_data['location'] == country]
-                logger.info(f"{country}: cases={country_data['total_cases'].iloc[0]}, deaths={country_data['total_deaths'].iloc[0]}")
+            self.version = dataset_version(self.csv_path)
 
+            # Attach to the arrays another process already built; otherwise build and publish them
+            self._report("attaching", 0.0)
+            if self._attach_store():
+                return
+            self._report("waiting_for_build_lock", 0.05)
+            with shared_store.build_lock(self.store_root):
+                if self._attach_store():
+                    return
+                self._build(previous)
+                self._report("publishing", 0.9)
+                self._publish_store()
         except Exception as e:
             logger.error(f"Error loading CSV: {e}")
             raise
 
-    def get_dates(self):
-        return self.date_strings
+    def _report(self, phase: str, fraction: float):
+        """Forward load progress to the optional callback (used by the readiness endpoint)"""
+        if self.progress is not None:
+            self.progress(phase, fraction)
+
+    def _build(self, previous: Optional["DataService"] = None):
+        """Load the cleaned frame and build the cube, indexes and rankings from it"""
+        # A refreshed file that only appends rows for new dates extends the previous dataset
+        if previous is not None and self._append(previous):
+            return
+
+        self.source_size, self.source_digest = source_fingerprint(self.csv_path)
+        self._report("reading_snapshot", 0.1)
+        self.df = load_snapshot(self.csv_path, self.snapshot_path)
+        if self.df is not None:
+            logger.info(f"Loaded {len(self.df)} rows from snapshot {self.snapshot_path}")
+        else:
+            self._report("reading_csv", 0.15)
+            self.df = self._read_csv()
+            save_snapshot(self.csv_path, self.snapshot_path, self.df)
+            logger.info(f"Wrote snapshot {self.snapshot_path}")
+
+        # Get the latest date with non-zero data (up to cutoff)
+        latest_date = self.df[self.df['total_cases'] > 0]['date'].max()
+        logger.info(f"Latest date with non-zero data: {ordinal_dates([latest_date])[0]}")
+
+        # Update the available dates for the timeline to only include up to latest_date
+        unique_dates = np.unique(self.df['date'].to_numpy())
+        self.date_strings = ordinal_dates(unique_dates)
+        logger.info(f"Date range: {self.date_strings[0]} to {self.date_strings[-1]}")
+
+        self._report("building_cube", 0.5)
+        self._build_cube(unique_dates)
+        self._report("building_indexes", 0.7)
+        self._build_lookups()
+        self._build_country_spans()
+        self._report("building_rankings", 0.8)
+        self._build_rankings()
+        self._report("building_derived_metrics", 0.85)
+        self._build_derived()
+        self.prefix_sums = narrow(prefix_sums(self.cube[:, :, FLOW_INDEXES]))
+
+        # Log some basic statistics
+        unique_countries = self.df['location'].nunique()
+        logger.info(f"Number of unique countries: {unique_countries}")
+
+        # Log all countries and their latest data
+        latest_data = self.df[self.df['date'] == latest_date]
+        latest_data = latest_data[latest_data['total_cases'] > 0]  # Only include countries with cases
+        logger.info(f"Latest date: {ordinal_dates([latest_date])[0]}")
+        logger.debug(f"Countries with data: {', '.join(sorted(latest_data['location'].unique()))}")
+        logger.info(f"Number of countries with data: {len(latest_data)}")
+
+        # Log data completeness (per-country, so only at debug level)
+        if logger.isEnabledFor(logging.DEBUG):
+            for country in sorted(latest_data['location'].unique()):
+                country_data = latest_data[latest_data['location'] == country]
+                logger.debug(f"{country}: cases={country_data['total_cases'].iloc[0]}, deaths={country_data['total_deaths'].iloc[0]}")
+
+    def _attach_store(self) -> bool:
+        """Use the shared memory-mapped arrays for this dataset version if they have been published"""
+        store = shared_store.attach(self.store_root, self.version)
+        if store is None:
+            return False
+        meta, arrays = store["meta"], store["arrays"]
+        self.date_strings = meta["date_strings"]
+        self.countries = meta["countries"]
+        self.iso_codes = meta["iso_codes"]
+        self.map_codes = meta["map_codes"]
+        self.source_size = meta.get("source_size")
+        self.source_digest = meta.get("source_digest")
+        self.cube = MetricCube([arrays[f"cube_{metric}"] for metric in CUBE_METRICS])
+        self.country_spans = arrays["country_spans"]
+        self.rankings = {metric: arrays[f"rank_{metric}"] for metric in RANKED_METRICS}
+        self.ranked_counts = {metric: arrays[f"count_{metric}"] for metric in RANKED_METRICS}
+        self.derived = {metric: arrays[f"derived_{metric}"] for metric in DERIVED_METRICS}
+        self.prefix_sums = arrays["prefix_sums"]
+        self._build_lookups()
+
+        # The cleaned frame is only needed while building
+        self.df = None
+        logger.info(f"Attached to shared dataset {self.version} in {self.store_root} (cube {self.cube.shape})")
+        return True
+
+    def _publish_store(self):
+        """Write the built arrays to the shared store and switch this process over to the mapped copy"""
+        arrays = {"country_spans": self.country_spans, "prefix_sums": self.prefix_sums}
+        arrays.update({f"cube_{metric}": values for metric, values in zip(CUBE_METRICS, self.cube.metrics)})
+        arrays.update({f"rank_{metric}": self.rankings[metric] for metric in RANKED_METRICS})
+        arrays.update({f"count_{metric}": self.ranked_counts[metric] for metric in RANKED_METRICS})
+        arrays.update({f"derived_{metric}": self.derived[metric] for metric in DERIVED_METRICS})
+        meta = {
+            "date_strings": self.date_strings,
+            "countries": self.countries,
+            "iso_codes": self.iso_codes,
+            "map_codes": self.map_codes,
+            "source_size": self.source_size,
+            "source_digest": self.source_digest
+        }
+        try:
+            shared_store.publish(self.store_root, self.version, meta, arrays)
+        except OSError as e:
+            logger.warning(f"Could not publish shared dataset to {self.store_root}, keeping a private copy: {e}")
+            return
+        self._attach_store()
+
+    def memory_usage(self) -> Dict:
+        """Bytes held per column and structure, split into memory-mapped (shared by all workers) and private"""
+        columns = [array_usage(f"cube.{metric}", self.cube[:, :, k]) for k, metric in enumerate(CUBE_METRICS)]
+        columns += [array_usage(f"derived.{metric}", values) for metric, values in self.derived.items()]
+        columns.append(array_usage("prefix_sums", self.prefix_sums))
+        columns.append(array_usage("country_spans", self.country_spans))
+        for metric in RANKED_METRICS:
+            columns.append(array_usage(f"rankings.{metric}", self.rankings[metric]))
+            columns.append(array_usage(f"ranked_counts.{metric}", self.ranked_counts[metric]))
+        columns += [array_usage(f"metric.{metric}", values) for metric, values in list(self.metric_arrays.items())]
+        for (flow, per_country), table in list(self.range_max.items()):
+            # Level 0 is the daily data itself, only the coarser levels are extra
+            name = f"range_max.{FLOW_METRICS[flow]}.{'country' if per_country else 'global'}"
+            columns += [array_usage(f"{name}.{k}", level) for k, level in enumerate(table.levels[1:], 1)]
+        for (granularity, group_by), view in list(self.views.items()):
+            if view.cube is not self.cube:
+                columns.append(array_usage(f"view.{granularity}.{group_by}", view.cube))
+            columns += [array_usage(f"view.{granularity}.{group_by}.{metric}", values)
+                        for metric, values in list(view.metrics.items())]
+        for name in ("date_strings", "countries", "iso_codes", "map_codes",
+                     "date_positions", "country_positions", "code_positions"):
+            columns.append(object_usage(name, getattr(self, name)))
+        columns += [array_usage(name, getattr(self, name)) for name in ("country_array", "map_code_array")]
+
+        shared = sum(column["bytes"] for column in columns if column["shared"])
+        private = sum(column["bytes"] for column in columns if not column["shared"])
+        return {
+            "dataset_version": self.version,
+            "shared_bytes": shared,
+            "private_bytes": private,
+            "total_bytes": shared + private,
+            "columns": columns
+        }
+
+    def get_dates(self, granularity: str = "day"):
+        return self.view(granularity).dates
+
+    def _read_csv(self) -> pd.DataFrame:
+        """Parse and clean the OWID CSV, reading only the columns we serve"""
+        logger.info(f"Loading CSV file from {self.csv_path}")
+
+        # Check if all required columns exist
+        header = pd.read_csv(self.csv_path, nrows=0).columns
+        missing_columns = [col for col in COLUMNS if col not in header]
+        if missing_columns:
+            logger.error(f"Missing columns in CSV: {missing_columns}")
+            raise ValueError(f"Missing required columns: {missing_columns}")
+
+        df = self._parse(self.csv_path)
+        logger.info(f"After filtering sovereign states: {len(df)} rows")
+        if logger.isEnabledFor(logging.DEBUG):
+            for col in COLUMNS:
+                if col not in TEXT_COLUMNS:
+                    logger.debug(f"Column {col} - Non-zero values: {(df[col] > 0).sum()}")
+        return df
+
+    def _parse(self, source) -> pd.DataFrame:
+        """Clean the served columns of OWID CSV rows from a path or buffer"""
+        # Country keys repeat on every row, so they are read as categoricals
+        numeric_columns = [col for col in COLUMNS if col not in TEXT_COLUMNS]
+        dtypes = {col: "float64" for col in numeric_columns}
+        dtypes.update({"location": "category", "iso_code": "category", "date": "object"})
+        df = pd.read_csv(source, usecols=COLUMNS, dtype=dtypes)[COLUMNS]
+
+        # Dates become int32 day ordinals; one mask keeps sovereign states up to the hard cutoff
+        days = date_ordinals(df["date"])
+        keep = df["iso_code"].isin(SOVEREIGN_STATES).to_numpy() & df["location"].notna().to_numpy()
+        keep &= days <= date_ordinals([CUTOFF_DATE])[0]
+        df = df[keep].reset_index(drop=True)
+        df["date"] = days[keep]
+        for col in ("location", "iso_code"):
+            df[col] = df[col].cat.remove_unused_categories()
+
+        # Fill missing numeric values with 0, then narrow the columns float32 holds exactly
+        df[numeric_columns] = df[numeric_columns].fillna(0)
+        return downcast_floats(df)
+
+    def _build_cube(self, unique_dates: np.ndarray):
+        """Build the dense dates x countries x metrics cube used by the per-date endpoints"""
+        countries = self.df[['location', 'iso_code']].drop_duplicates('location').astype(str).sort_values('location')
+
+        self.countries = countries['location'].tolist()
+        self.iso_codes = countries['iso_code'].tolist()
+        self.map_codes = [COUNTRY_CODE_MAP.get(code, code) for code in self.iso_codes]
+
+        # Each metric is stored as float32 where that is exact, e.g. daily counts but not cumulative totals
+        self.cube = MetricCube.compact(self._scatter(self.df, unique_dates))
+        logger.info(f"Built data cube with shape {self.cube.shape}")
+
+    def _scatter(self, rows: pd.DataFrame, dates: np.ndarray) -> np.ndarray:
+        """Place frame rows into a dates x countries x metrics block (dates: sorted day ordinals)"""
+        # Countries without a row for a given date stay NaN, so they never pass the case filter
+        date_idx = np.searchsorted(dates, rows['date'].to_numpy())
+        locations = rows['location'].cat
+        country_idx = pd.Index(self.countries).get_indexer(locations.categories)[locations.codes]
+        block = np.full((len(dates), len(self.countries), len(CUBE_METRICS)), np.nan)
+        block[date_idx, country_idx] = rows[CUBE_METRICS].to_numpy(dtype=np.float64)
+        return block
+
+    def _append(self, previous: "DataService") -> bool:
+        """Extend the previous dataset with the rows appended to its CSV, parsing only those rows
+
+        False if a full build is needed: the file was rewritten rather than appended to, or the
+        new rows revise loaded dates or add countries.
+        """
+        if previous.cube is None or previous.source_digest is None:
+            return False
+        self._report("reading_appended_rows", 0.1)
+        appended = read_appended(self.csv_path, previous.source_size, previous.source_digest)
+        if appended is None:
+            logger.info(f"{self.csv_path} was rewritten rather than appended to, rebuilding")
+            return False
+        header, tail, digest = appended
+
+        rows = self._parse(io.BytesIO(header + tail))
+        days = rows['date'].to_numpy()
+        if len(rows) and days.min() <= date_ordinals(previous.date_strings[-1:])[0]:
+            logger.info("Appended rows revise dates already loaded, rebuilding")
+            return False
+        if not set(rows['location'].unique()) <= set(previous.countries):
+            logger.info("Appended rows add countries, rebuilding")
+            return False
+
+        self.source_size, self.source_digest = previous.source_size + len(tail), digest
+        self.countries = previous.countries
+        self.iso_codes = previous.iso_codes
+        self.map_codes = previous.map_codes
+        new_dates = np.unique(days)
+        self.date_strings = previous.date_strings + ordinal_dates(new_dates)
+
+        # Every per-date structure is extended from the previous last date onward
+        self._report("building_cube", 0.5)
+        self.cube = previous.cube.extend(self._scatter(rows, new_dates))
+        self._build_lookups()
+        self._build_country_spans(previous)
+        self._report("building_rankings", 0.8)
+        self._build_rankings(previous)
+        self._report("building_derived_metrics", 0.85)
+        self._build_derived(previous)
+        old_count = len(previous.date_strings)
+        flows = np.cumsum(np.nan_to_num(self.cube[old_count:, :, FLOW_INDEXES]), axis=0)
+        self.prefix_sums = narrow(np.concatenate([previous.prefix_sums, previous.prefix_sums[-1] + flows]))
+        self.range_max = {
+            key: RangeMax(self._range_max_values(*key), table) for key, table in list(previous.range_max.items())
+        }
+        logger.info(f"Appended {len(rows)} rows ({len(new_dates)} dates) to the previous dataset, cube {self.cube.shape}")
+        return True
+
+    def _build_lookups(self):
+        """Lookups by date, country name and country code"""
+        self.date_positions = {d: i for i, d in enumerate(self.date_strings)}
+        self.country_array = np.array(self.countries, dtype=str)
+        self.map_code_array = np.array(self.map_codes, dtype=str)
+        self.country_positions = {name.lower(): i for i, name in enumerate(self.countries)}
+        self.code_positions = {code: i for i, code in enumerate(self.iso_codes)}
+        self.code_positions.update({code: i for i, code in enumerate(self.map_codes)})
+
+    def _build_country_spans(self, previous: Optional["DataService"] = None):
+        """First and last cube row holding data for each country, only scanning the dates added since `previous`"""
+        start = len(previous.date_strings) if previous is not None else 0
+        if previous is not None and start == len(self.cube):
+            self.country_spans = previous.country_spans
+            return
+        present = ~np.isnan(self.cube[start:, :, TOTAL_CASES])
+        first = start + present.argmax(axis=0)
+        last = len(self.cube) - 1 - present[::-1].argmax(axis=0)
+        if previous is not None:
+            # Every country has a row before the new dates, so only its last row can move
+            first = previous.country_spans[:, 0]
+            last = np.where(present.any(axis=0), last, previous.country_spans[:, 1])
+        self.country_spans = np.stack([first, last], axis=1).astype(index_type(len(self.cube)))
+
+    def _build_rankings(self, previous: Optional["DataService"] = None):
+        """Per-date country order for each ranked metric, largest first, countries without data last
+
+        With `previous`, only the dates added since are ranked.
+        """
+        start = len(previous.date_strings) if previous is not None else 0
+        country_type = index_type(len(self.countries))
+        for metric in RANKED_METRICS:
+            values = self.cube[start:, :, CUBE_METRICS.index(metric)]
+            # Stable sort on name-ordered columns breaks ties alphabetically, like nlargest on the sorted frame
+            order = np.argsort(-np.nan_to_num(values, nan=-np.inf), axis=1, kind='stable').astype(country_type)
+            counts = np.count_nonzero(~np.isnan(values), axis=1).astype(country_type)
+            if previous is not None:
+                order = np.concatenate([previous.rankings[metric], order])
+                counts = np.concatenate([previous.ranked_counts[metric], counts])
+            self.rankings[metric] = order
+            self.ranked_counts[metric] = counts
+
+    def _build_derived(self, previous: Optional["DataService"] = None):
+        """Derived metrics for every date and country, computed once from the cube
+
+        With `previous`, only the dates added since are computed, from the few weeks of history they depend on.
+        """
+        old_count = len(previous.date_strings) if previous is not None else 0
+        start = max(0, old_count - DERIVED_LOOKBACK)
+        derived = compute_derived(
+            self.cube[start:, :, NEW_CASES], self.cube[start:, :, NEW_DEATHS],
+            self.cube[start:, :, TOTAL_CASES], self.cube[start:, :, TOTAL_DEATHS]
+        )
+        if previous is not None:
+            derived = {
+                metric: np.concatenate([previous.derived[metric], values[old_count - start:]])
+                for metric, values in derived.items()
+            }
+        self.derived = {metric: narrow(values) for metric, values in derived.items()}
+
+    def available_metrics(self) -> List[str]:
+        """Numeric columns of the source CSV that can be requested as a metric"""
+        if self._available_metrics is None:
+            header = pd.read_csv(self.csv_path, nrows=0).columns
+            self._available_metrics = [col for col in header if col not in OWID_TEXT_COLUMNS]
+        return self._available_metrics
+
+    def _check_metric(self, metric: str):
+        if metric not in CUBE_METRICS and metric not in DERIVED_METRICS and metric not in self.available_metrics():
+            raise ValueError(f"Unknown metric {metric}")
+
+    def metric_values(self, metric: str) -> np.ndarray:
+        """Values of a metric for every date and country (NaN where not reported)
+
+        Cube and derived metrics are precomputed. Any other CSV column is read and cleaned on
+        first use, cached for this dataset version and shared with the other processes.
+        """
+        if metric in CUBE_METRICS:
+            return self.cube[:, :, CUBE_METRICS.index(metric)]
+        if metric in DERIVED_METRICS:
+            return self.derived[metric]
+        values = self.metric_arrays.get(metric)
+        if values is not None:
+            return values
+
+        self._check_metric(metric)
+        with self._lazy_lock:
+            values = self.metric_arrays.get(metric)
+            if values is None:
+                name = f"metric_{metric}"
+                values = shared_store.load_array(self.store_root, self.version, name)
+                if values is None:
+                    values = self._read_metric(metric)
+                    self._publish_metric(name, values)
+                self.metric_arrays[metric] = values
+        return values
+
+    def _read_metric(self, metric: str) -> np.ndarray:
+        """Read one numeric column from the CSV into a dates x countries array"""
+        logger.info(f"Loading metric {metric} from {self.csv_path}")
+        columns = TEXT_COLUMNS + [metric]
+        df = pd.read_csv(self.csv_path, usecols=columns, dtype={"location": "category", "iso_code": "category", "date": "object"})
+        df = df[df["iso_code"].isin(SOVEREIGN_STATES) & df["location"].notna()]
+
+        # Rows after the cutoff or for countries outside the cube find no position and are dropped
+        date_idx = pd.Index(date_ordinals(self.date_strings)).get_indexer(date_ordinals(df["date"]))
+        country_idx = pd.Index(self.countries).get_indexer(df["location"])
+        keep = (date_idx >= 0) & (country_idx >= 0)
+        values = np.full((len(self.date_strings), len(self.countries)), np.nan)
+        values[date_idx[keep], country_idx[keep]] = pd.to_numeric(df[metric], errors="coerce").to_numpy(dtype=np.float64)[keep]
+        return narrow(values)
+
+    def _publish_metric(self, name: str, values: np.ndarray):
+        # Only publish into the store version this service was built from
+        if dataset_version(self.csv_path) != self.version:
+            return
+        try:
+            shared_store.save_array(self.store_root, self.version, name, values)
+        except OSError as e:
+            logger.warning(f"Could not publish {name} to {self.store_root}: {e}")
+
+    def _date_position(self, date) -> Optional[int]:
+        """Return the cube row for a date string, or None if the date is not loaded"""
+        return self.date_positions.get(pd.to_datetime(date).strftime("%Y-%m-%d"))
+
+    def view(self, granularity: str = "day", group_by: str = "country") -> CubeView:
+        """The cube downsampled to weeks or months and/or rolled up by region, built once on first use"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity}, expected one of {list(GRANULARITIES)}")
+        if group_by not in GROUPINGS:
+            raise ValueError(f"Unknown group_by {group_by}, expected one of {list(GROUPINGS)}")
+        key = (granularity, group_by)
+        view = self.views.get(key)
+        if view is None:
+            with self._lazy_lock:
+                view = self.views.get(key)
+                if view is None:
+                    view = self.views[key] = self._build_view(granularity, group_by)
+        return view
+
+    def _build_view(self, granularity: str, group_by: str) -> CubeView:
+        if group_by == "country":
+            if granularity == "day":
+                return CubeView(self.cube, self.date_strings, self.date_strings, self.country_array, self.map_code_array)
+
+            # Flows add up over the bucket, cumulative metrics keep their latest (largest) value
+            starts = bucket_starts(self.date_strings, granularity)
+            cube = np.stack([
+                reduce_dates(self.cube[:, :, k], starts, "sum" if metric in FLOW_METRICS else "max")
+                for k, metric in enumerate(CUBE_METRICS)
+            ], axis=2)
+            dates = [self.date_strings[i] for i in starts]
+            ends = [self.date_strings[i - 1] for i in starts[1:]] + self.date_strings[-1:]
+            logger.info(f"Built {granularity}ly view with {len(dates)} buckets")
+            return CubeView(cube, dates, ends, self.country_array, self.map_code_array, starts=starts)
+
+        base = self.view(granularity, "country")
+        names, order, starts = group_columns(self._country_groups(group_by))
+        cube, counts = reduce_groups(base.cube, order, starts)
+
+        # Per-million figures of a region come from its summed totals and population
+        with np.errstate(invalid="ignore", divide="ignore"):
+            population = np.where(cube[:, :, POPULATION] > 0, cube[:, :, POPULATION], np.nan)
+            cube[:, :, CASES_PER_MILLION] = cube[:, :, TOTAL_CASES] / population * 1e6
+            cube[:, :, DEATHS_PER_MILLION] = cube[:, :, TOTAL_DEATHS] / population * 1e6
+        logger.info(f"Built {granularity}ly rollup by {group_by} with {len(names)} groups")
+        return CubeView(cube, base.dates, base.ends, np.array(names, dtype=str), counts=counts, starts=base.starts)
+
+    def _country_groups(self, group_by: str) -> List[str]:
+        """Group label of each cube column"""
+        if group_by == "who_region":
+            return [WHO_REGION_OF.get(code, "Other") for code in self.iso_codes]
+
+        # Continents come from the OWID file itself, read on first use
+        header = pd.read_csv(self.csv_path, nrows=0).columns
+        if "continent" not in header:
+            return ["Other"] * len(self.countries)
+        df = pd.read_csv(self.csv_path, usecols=["location", "continent"], dtype="object").dropna()
+        continents = df.drop_duplicates("location").set_index("location")["continent"]
+        return [continents.get(country, "Other") for country in self.countries]
+
+    def _check_view_metric(self, view: CubeView, metric: Optional[str]):
+        """Reject an unknown metric, or one a regional rollup cannot aggregate, before any work starts"""
+        if metric is None:
+            return
+        self._check_metric(metric)
+        if view.counts is not None and metric not in CUBE_METRICS:
+            raise ValueError(f"Metric {metric} cannot be rolled up by region, use one of {CUBE_METRICS}")
+
+    def _view_metric(self, view: CubeView, metric: str) -> np.ndarray:
+        """Values of a metric for every row and column of a view"""
+        if metric in CUBE_METRICS:
+            return view.cube[:, :, CUBE_METRICS.index(metric)]
+        self._check_view_metric(view, metric)
+        if view.starts is None:
+            return self.metric_values(metric)
+        values = view.metrics.get(metric)
+        if values is None:
+            # Without knowing whether a column is a flow or a level, buckets report its average
+            values = view.metrics[metric] = reduce_dates(self.metric_values(metric), view.starts, "mean")
+        return values
+
+    def _map_columns(self, position: int, metric: Optional[str] = None,
+                     view: Optional[CubeView] = None) -> Dict[str, np.ndarray]:
+        """Map data for one cube row as parallel arrays, sorted by severity
+
+        Severity is scaled from cases per million unless another metric is requested, in which
+        case countries without a value for it are left out and the value is returned too.
+        Region views return one entry per region with the number of reporting countries.
+        """
+        view = view or self.view()
+
+        # Filter for countries with at least 10 cases (show gray for <10)
+        frame = view.cube[position]
+        present = frame[:, TOTAL_CASES] >= MIN_CASES
+        if metric is not None:
+            metric_row = np.asarray(self._view_metric(view, metric)[position], dtype=np.float64)
+            present &= ~np.isnan(metric_row)
+        idx = np.flatnonzero(present)
+        rows = frame[idx]
+
+        # Calculate severity based on cases per million (or the requested metric), negative values count as zero
+        values = metric_row[idx] if metric is not None else rows[:, CASES_PER_MILLION]
+        scaled = np.clip(values, 0, None)
+        max_value = scaled.max() if len(idx) else 0
+        if max_value > 0:
+            severity = scaled / max_value * 100
+        else:
+            severity = np.zeros(len(idx))
 
-    def get_map_data(self, date):
+        # Sort by severity for better visualization
+        order = np.argsort(-severity, kind='stable')
+        idx, rows, values, severity = idx[order], rows[order], values[order], severity[order]
+
+        if view.codes is not None:
+            columns = {"country": view.names[idx], "iso_code": view.codes[idx]}
+        else:
+            columns = {"region": view.names[idx], "countries": view.counts[position, idx]}
+        columns.update({
+            "cases": rows[:, TOTAL_CASES].astype(np.int64),
+            "deaths": rows[:, TOTAL_DEATHS].astype(np.int64),
+            "cases_per_million": rows[:, CASES_PER_MILLION],
+            "deaths_per_million": rows[:, DEATHS_PER_MILLION],
+            "severity": severity
+        })
+        if view.starts is not None:
+            columns["new_cases"] = rows[:, NEW_CASES].astype(np.int64)
+            columns["new_deaths"] = rows[:, NEW_DEATHS].astype(np.int64)
+        if metric is not None:
+            columns["value"] = values
+        return columns
+
+    def _map_countries(self, position: int, metric: Optional[str] = None,
+                       view: Optional[CubeView] = None) -> List[Dict]:
+        """Map entries for one cube row, sorted by severity"""
+        columns = self._map_columns(position, metric, view)
+        fields = list(columns)
+        return [
+            dict(zip(fields, row))
+            for row in zip(*(columns[field].tolist() for field in fields))
+        ]
+
+    def _global_totals(self, position: int, view: Optional[CubeView] = None) -> Dict:
+        """Global totals for one cube row"""
+        # Filter for countries with at least 10 cases (show gray for <10)
+        frame = (view or self.view()).cube[position]
+        rows = frame[frame[:, TOTAL_CASES] >= MIN_CASES]
+        return {
+            "total_cases": int(rows[:, TOTAL_CASES].sum()),
+            "total_deaths": int(rows[:, TOTAL_DEATHS].sum()),
+            "total_countries": len(rows)
+        }
+
+    def _view_position(self, view: CubeView, date) -> Optional[int]:
+        """Row of the view holding a date: the date itself for daily views, its bucket otherwise"""
+        if view.starts is None:
+            return self._date_position(date)
+        return view.position(pd.to_datetime(date).strftime("%Y-%m-%d"))
+
+    @staticmethod
+    def _describe(result: Dict, view: CubeView, position: Optional[int], metric: Optional[str],
+                  granularity: str, group_by: str) -> Dict:
+        """Add the metric, bucket period and grouping of a non-default query to its result"""
+        if metric is not None:
+            result["metric"] = metric
+        if granularity != "day":
+            result["granularity"] = granularity
+            if position is not None:
+                result["period"] = {"start": view.dates[position], "end": view.ends[position]}
+        if group_by != "country":
+            result["group_by"] = group_by
+        return result
+
+    def get_map_data(self, date, metric: Optional[str] = None, granularity: str = "day", group_by: str = "country"):
         try:
-            logger.info(f"=== GET MAP DATA START ===")
-            logger.info(f"Getting map data for date: {date}")
-            date_obj = pd.to_datetime(date)
-            day_data = self.df[self.df['date'] == date_obj].copy()
-            logger.info(f"Found {len(day_data)} rows for date {date}")
-            logger.info(f"Sample of raw data:\n{day_data[['location', 'total_cases', 'total_deaths']].head()}")
+            logger.debug(f"Getting map data for date: {date}")
+            if metric is not None:
+                self._check_metric(metric)
+            view = self.view(granularity, group_by)
+            position = self._view_position(view, date)
 
             # If no data for this date, return empty result (do NOT use latest available date)
-            if day_data.empty:
-                logger.info(f"No data for {date}, returning empty result.")
-                return {"date": date, "countries": []}
-
-            # Filter for countries with at least 10 cases (show gray for <10)
-            day_data = day_data[day_data['total_cases'] >= 10].copy()
-            logger.info(f"After filtering zero cases, found {len(day_data)} countries with data")
-            logger.info(f"Sample of filtered data:\n{day_data[['location', 'total_cases', 'total_deaths']].head()}")
-            
-            # Calculate severity based on cases per million
-            max_cases_per_million = day_data['total_cases_per_million'].max()
-            logger.info(f"Max cases per million: {max_cases_per_million}")
-            
-            if max_cases_per_million > 0:
-                day_data.loc[:, 'severity'] = (day_data['total_cases_per_million'] / max_cases_per_million * 100).fillna(0)
+            if position is None:
+                logger.debug(f"No data for {date}, returning empty result.")
+                return self._describe({"date": date, "countries": []}, view, None, metric, granularity, group_by)
+
+            countries = self._map_countries(position, metric, view)
+            logger.debug(f"Found {len(countries)} countries with data for {date}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for country in countries:
+                    logger.debug(f"Map entry: {country}")
+
+            result = {"date": view.dates[position], "countries": countries}
+            return self._describe(result, view, position, metric, granularity, group_by)
+        except Exception as e:
+            logger.error(f"Error in get_map_data: {e}")
+            raise
+
+    def get_map_columns(self, date, metric: Optional[str] = None, granularity: str = "day",
+                        group_by: str = "country") -> Dict:
+        """Map data for a date as parallel arrays (one per field) instead of one dict per country"""
+        try:
+            if metric is not None:
+                self._check_metric(metric)
+            view = self.view(granularity, group_by)
+            position = self._view_position(view, date)
+            if position is None:
+                result = {"date": date, "columns": self._map_columns_empty(metric, view)}
             else:
-                day_data.loc[:, 'severity'] = 0
-            
-            # Sort by severity for better visualization
-            day_data = day_data.sort_values('severity', ascending=False)
-            
-            # Map country codes to match the map data
-            country_code_map = {
-                # North America
-                'USA': '840',  # United States
-                'CAN': '124',  # Canada
-                'MEX': '484',  # Mexico
-                
-                # South America
-                'ARG': '032',  # Argentina
-                'BOL': '068',  # Bolivia
-                'BRA': '076',  # Brazil
-                'CHL': '152',  # Chile
-                'COL': '170',  # Colombia
-                'ECU': '218',  # Ecuador
-                'GUY': '328',  # Guyana
-                'PER': '604',  # Peru
-                'PRY': '600',  # Paraguay
-                'SUR': '740',  # Suriname
-                'URY': '858',  # Uruguay
-                'VEN': '862',  # Venezuela
-                
-                # Europe
-                'ALB': '008',  # Albania
-                'AND': '020',  # Andorra
-                'AUT': '040',  # Austria
-                'BEL': '056',  # Belgium
-                'BIH': '070',  # Bosnia and Herzegovina
-                'BGR': '100',  # Bulgaria
-                'HRV': '191',  # Croatia
-                'CZE': '203',  # Czech Republic
-                'DNK': '208',  # Denmark
-                'EST': '233',  # Estonia
-                'FIN': '246',  # Finland
-                'FRA': '250',  # France
-                'DEU': '276',  # Germany
-                'GRC': '300',  # Greece
-                'HUN': '348',  # Hungary
-                'ISL': '352',  # Iceland
-                'IRL': '372',  # Ireland
-                'ITA': '380',  # Italy
-                'LVA': '428',  # Latvia
-                'LIE': '438',  # Liechtenstein
-                'LTU': '440',  # Lithuania
-                'LUX': '442',  # Luxembourg
-                'MLT': '470',  # Malta
-                'MDA': '498',  # Moldova
-                'MCO': '492',  # Monaco
-                'MNE': '499',  # Montenegro
-                'NLD': '528',  # Netherlands
-                'MKD': '807',  # North Macedonia
-                'NOR': '578',  # Norway
-                'POL': '616',  # Poland
-                'PRT': '620',  # Portugal
-                'ROU': '642',  # Romania
-                'RUS': '643',  # Russia
-                'SMR': '674',  # San Marino
-                'SRB': '688',  # Serbia
-                'SVK': '703',  # Slovakia
-                'SVN': '705',  # Slovenia
-                'ESP': '724',  # Spain
-                'SWE': '752',  # Sweden
-                'CHE': '756',  # Switzerland
-                'UKR': '804',  # Ukraine
-                'GBR': '826',  # United Kingdom
-                'VAT': '336',  # Vatican City
-                
-                # Africa
-                'DZA': '012',  # Algeria
-                'AGO': '024',  # Angola
-                'BEN': '204',  # Benin
-                'BWA': '072',  # Botswana
-                'BFA': '854',  # Burkina Faso
-                'BDI': '108',  # Burundi
-                'CMR': '120',  # Cameroon
-                'CPV': '132',  # Cape Verde
-                'CAF': '140',  # Central African Republic
-                'TCD': '148',  # Chad
-                'COM': '174',  # Comoros
-                'COG': '178',  # Congo
-                'COD': '180',  # Democratic Republic of the Congo
-                'DJI': '262',  # Djibouti
-                'EGY': '818',  # Egypt
-                'GNQ': '226',  # Equatorial Guinea
-                'ERI': '232',  # Eritrea
-                'ETH': '231',  # Ethiopia
-                'GAB': '266',  # Gabon
-                'GMB': '270',  # Gambia
-                'GHA': '288',  # Ghana
-                'GIN': '324',  # Guinea
-                'GNB': '624',  # Guinea-Bissau
-                'KEN': '404',  # Kenya
-                'LSO': '426',  # Lesotho
-                'LBR': '430',  # Liberia
-                'LBY': '434',  # Libya
-                'MDG': '450',  # Madagascar
-                'MWI': '454',  # Malawi
-                'MLI': '466',  # Mali
-                'MRT': '478',  # Mauritania
-                'MUS': '480',  # Mauritius
-                'MAR': '504',  # Morocco
-                'MOZ': '508',  # Mozambique
-                'NAM': '516',  # Namibia
-                'NER': '562',  # Niger
-                'NGA': '566',  # Nigeria
-                'RWA': '646',  # Rwanda
-                'STP': '678',  # Sao Tome and Principe
-                'SEN': '686',  # Senegal
-                'SYC': '690',  # Seychelles
-                'SLE': '694',  # Sierra Leone
-                'SOM': '706',  # Somalia
-                'ZAF': '710',  # South Africa
-                'SSD': '728',  # South Sudan
-                'SDN': '729',  # Sudan
-                'SWZ': '748',  # Eswatini
-                'TZA': '834',  # Tanzania
-                'TGO': '768',  # Togo
-                'TUN': '788',  # Tunisia
-                'UGA': '800',  # Uganda
-                'ZMB': '894',  # Zambia
-                'ZWE': '716',  # Zimbabwe
-                
-                # Asia
-                'AFG': '004',  # Afghanistan
-                'ARM': '051',  # Armenia
-                'AZE': '031',  # Azerbaijan
-                'BHR': '048',  # Bahrain
-                'BGD': '050',  # Bangladesh
-                'BTN': '064',  # Bhutan
-                'BRN': '096',  # Brunei
-                'KHM': '116',  # Cambodia
-                'CHN': '156',  # China
-                'CYP': '196',  # Cyprus
-                'GEO': '268',  # Georgia
-                'IND': '356',  # India
-                'IDN': '360',  # Indonesia
-                'IRN': '364',  # Iran
-                'IRQ': '368',  # Iraq
-                'ISR': '376',  # Israel
-                'JOR': '400',  # Jordan
-                'KAZ': '398',  # Kazakhstan
-                'KWT': '414',  # Kuwait
-                'KGZ': '417',  # Kyrgyzstan
-                'LAO': '418',  # Laos
-                'LBN': '422',  # Lebanon
-                'MYS': '458',  # Malaysia
-                'MDV': '462',  # Maldives
-                'MNG': '496',  # Mongolia
-                'MMR': '104',  # Myanmar
-                'NPL': '524',  # Nepal
-                'OMN': '512',  # Oman
-                'PAK': '586',  # Pakistan
-                'PSE': '275',  # Palestine
-                'PHL': '608',  # Philippines
-                'QAT': '634',  # Qatar
-                'SAU': '682',  # Saudi Arabia
-                'SGP': '702',  # Singapore
-                'LKA': '144',  # Sri Lanka
-                'SYR': '760',  # Syria
-                'TJK': '762',  # Tajikistan
-                'THA': '764',  # Thailand
-                'TLS': '626',  # Timor-Leste
-                'TUR': '792',  # Turkey
-                'TKM': '795',  # Turkmenistan
-                'ARE': '784',  # United Arab Emirates
-                'UZB': '860',  # Uzbekistan
-                'VNM': '704',  # Vietnam
-                'YEM': '887',  # Yemen
-                
-                # Oceania
-                'AUS': '036',  # Australia
-                'FJI': '242',  # Fiji
-                'KIR': '296',  # Kiribati
-                'MHL': '584',  # Marshall Islands
-                'FSM': '583',  # Micronesia
-                'NRU': '520',  # Nauru
-                'NZL': '554',  # New Zealand
-                'PLW': '585',  # Palau
-                'PNG': '598',  # Papua New Guinea
-                'WSM': '882',  # Samoa
-                'SLB': '090',  # Solomon Islands
-                'TON': '776',  # Tonga
-                'TUV': '798',  # Tuvalu
-                'VUT': '548'   # Vanuatu
-            }
-            
-            # Log the countries we're returning
-            logger.info(f"Returning data for {len(day_data)} countries")
-            logger.info(f"Countries: {', '.join(day_data['location'].unique())}")
-            
-            # Log data for each country
-            for _, row in day_data.iterrows():
-                logger.info(f"Country data - {row['location']}: cases={row['total_cases']}, deaths={row['total_deaths']}, severity={row['severity']}")
-            
+                result = {"date": view.dates[position], "columns": self._map_columns(position, metric, view)}
+            return self._describe(result, view, position, metric, granularity, group_by)
+        except Exception as e:
+            logger.error(f"Error in get_map_columns: {e}")
+            raise
+
+    def get_map_delta(self, base: str, date: str) -> Dict:
+        """Patch turning the map data of `base` into that of `date`
+
+        Only countries whose figures changed (or that appeared) are sent, plus the codes of
+        countries that dropped off the map. Severity is relative to the largest cases per
+        million of the day, so the patch carries that `scale` and clients rescale every
+        country from it instead of receiving all severities again.
+        """
+        try:
+            base_position, position = self._date_position(base), self._date_position(date)
+            if base_position is None or position is None:
+                raise ValueError(f"No data for {base if base_position is None else date}")
+
+            fields = [TOTAL_CASES, TOTAL_DEATHS, CASES_PER_MILLION, DEATHS_PER_MILLION]
+            before, after = self.cube[base_position], self.cube[position]
+            shown_before = before[:, TOTAL_CASES] >= MIN_CASES
+            shown_after = after[:, TOTAL_CASES] >= MIN_CASES
+            differs = (before[:, fields] != after[:, fields]).any(axis=1)
+            changed = np.flatnonzero(shown_after & (differs | ~shown_before))
+            removed = np.flatnonzero(shown_before & ~shown_after)
+
+            cases_per_million = after[shown_after, CASES_PER_MILLION]
+            scale = float(cases_per_million.max()) if len(cases_per_million) else 0.0
+            rows = after[changed]
+            severity = rows[:, CASES_PER_MILLION] / scale * 100 if scale > 0 else np.zeros(len(changed))
+
             result = {
-                "date": day_data['date'].iloc[0].strftime("%Y-%m-%d"),
-                "countries": [
-                    {
-                        "country": row["location"],
-                        "iso_code": country_code_map.get(row["iso_code"], row["iso_code"]),
-                        "cases": int(row["total_cases"]),
-                        "deaths": int(row["total_deaths"]),
-                        "cases_per_million": float(row["total_cases_per_million"]),
-                        "deaths_per_million": float(row["total_deaths_per_million"]),
-                        "severity": float(row["severity"])
-                    }
-                    for _, row in day_data.iterrows()
-                ]
+                "base": self.date_strings[base_position],
+                "date": self.date_strings[position],
+                "scale": scale,
+                "columns": {
+                    "country": self.country_array[changed],
+                    "iso_code": self.map_code_array[changed],
+                    "cases": rows[:, TOTAL_CASES].astype(np.int64),
+                    "deaths": rows[:, TOTAL_DEATHS].astype(np.int64),
+                    "cases_per_million": rows[:, CASES_PER_MILLION],
+                    "deaths_per_million": rows[:, DEATHS_PER_MILLION],
+                    "severity": severity
+                },
+                "removed": self.map_code_array[removed]
             }
-            logger.info(f"=== GET MAP DATA END ===")
+            result.update(self._global_totals(position))
+            logger.debug(f"Map delta {base} -> {date}: {len(changed)} changed, {len(removed)} removed")
             return result
         except Exception as e:
-            logger.error(f"Error in get_map_data: {e}")
+            logger.error(f"Error in get_map_delta: {e}")
             raise
 
-    def get_global_stats(self, date: Optional[str] = None) -> Dict:
-        """Get global COVID-19 statistics"""
+    def _map_columns_empty(self, metric: Optional[str] = None, view: Optional[CubeView] = None) -> Dict[str, np.ndarray]:
+        # Without any dates there is no row to take the column types from
+        if not len(self.date_strings):
+            return {}
+        empty = self._map_columns(0, metric, view)
+        return {field: values[:0] for field, values in empty.items()}
+
+    def get_global_stats(self, date: Optional[str] = None, metric: Optional[str] = None,
+                         granularity: str = "day", group_by: str = "country") -> Dict:
+        """Get global COVID-19 statistics, plus an aggregate of another metric if requested
+
+        Weekly and monthly buckets also report the new cases and deaths in the bucket, and a
+        regional grouping adds the totals of each region.
+        """
         try:
-            logger.info(f"=== GET GLOBAL STATS START ===")
+            if metric is not None:
+                self._check_metric(metric)
+            view = self.view(granularity, "country")
+            regions = self.view(granularity, group_by) if group_by != "country" else None
             if date:
-                logger.info(f"Getting stats for specific date: {date}")
-                # Convert date string to datetime
-                date_obj = pd.to_datetime(date)
-                logger.info(f"Converted date to datetime: {date_obj}")
-                
-                # Get data for specific date
-                day_data = self.df[self.df['date'] == date_obj].copy()
-                logger.info(f"Found {len(day_data)} rows for date {date}")
-                
-                if day_data.empty:
-                    logger.info(f"No data for {date}, returning zeros.")
-                    return {
+                logger.debug(f"Getting stats for specific date: {date}")
+                position = self._view_position(view, date)
+                if position is None:
+                    logger.debug(f"No data for {date}, returning zeros.")
+                    result = {
                         "total_cases": 0,
                         "total_deaths": 0,
                         "total_countries": 0,
                         "date": date
                     }
-                
-                # Filter for countries with at least 10 cases (show gray for <10)
-                day_data = day_data[day_data['total_cases'] >= 10].copy()
-                logger.info(f"After filtering zero cases, found {len(day_data)} countries with data")
-                logger.info(f"Countries with data: {', '.join(sorted(day_data['location'].unique()))}")
-                
-                # Calculate totals
-                total_cases = int(day_data['total_cases'].sum())
-                total_deaths = int(day_data['total_deaths'].sum())
-                total_countries = len(day_data)
-                
-                logger.info(f"Stats for {date}:")
-                logger.info(f"Total cases: {total_cases}")
-                logger.info(f"Total deaths: {total_deaths}")
-                logger.info(f"Countries with cases: {total_countries}")
-                
-                # Log data for each country
-                for _, row in day_data.iterrows():
-                    logger.info(f"Country data - {row['location']}: cases={row['total_cases']}, deaths={row['total_deaths']}")
+                    if metric is not None:
+                        result["metric"] = {"name": metric, "total": 0.0, "mean": None, "countries_reporting": 0}
+                    if regions is not None:
+                        result["regions"] = []
+                    return self._describe(result, view, None, None, granularity, group_by)
             else:
-                logger.info("Getting stats for latest date")
-                # Get latest data
-                latest_date = self.df['date'].max()
-                latest_data = self.df[self.df['date'] == latest_date].copy()
-                
-                logger.info(f"Found {len(latest_data)} rows for latest date {latest_date}")
-                
-                # Filter for countries with at least 10 cases (show gray for <10)
-                latest_data = latest_data[latest_data['total_cases'] >= 10].copy()
-                logger.info(f"After filtering zero cases, found {len(latest_data)} countries with data")
-                logger.info(f"Countries with data: {', '.join(sorted(latest_data['location'].unique()))}")
-                
-                total_cases = int(latest_data['total_cases'].sum())
-                total_deaths = int(latest_data['total_deaths'].sum())
-                total_countries = len(latest_data)
-                
-                logger.info(f"Latest stats (as of {latest_date}):")
-                logger.info(f"Total cases: {total_cases}")
-                logger.info(f"Total deaths: {total_deaths}")
-                logger.info(f"Countries with cases: {total_countries}")
-                
-                # Log data for each country
-                for _, row in latest_data.iterrows():
-                    logger.info(f"Country data - {row['location']}: cases={row['total_cases']}, deaths={row['total_deaths']}")
-            
-            result = {
-                "total_cases": total_cases,
-                "total_deaths": total_deaths,
-                "total_countries": total_countries,
-                "date": date if date else latest_date.strftime("%Y-%m-%d")
-            }
-            logger.info(f"=== GET GLOBAL STATS END ===")
-            return result
+                logger.debug("Getting stats for latest date")
+                position = len(view.dates) - 1
+
+            result = self._global_totals(position, view)
+            result["date"] = date if date else view.dates[position]
+            if view.starts is not None:
+                result["new_cases"] = int(np.nansum(view.cube[position, :, NEW_CASES]))
+                result["new_deaths"] = int(np.nansum(view.cube[position, :, NEW_DEATHS]))
+            if metric is not None:
+                result["metric"] = self._metric_summary(metric, position, view)
+            if regions is not None:
+                result["regions"] = self._region_totals(position, regions)
+            logger.debug(f"Stats for {result['date']}: cases={result['total_cases']}, deaths={result['total_deaths']}, countries={result['total_countries']}")
+            return self._describe(result, view, position, None, granularity, group_by)
         except Exception as e:
             logger.error(f"Error getting global stats: {str(e)}")
             raise
 
-    def get_country_data(self, country_name):
+    def _region_totals(self, position: int, regions: CubeView) -> List[Dict]:
+        """Cases, deaths and reporting countries of each region on one row of a region view"""
+        frame = regions.cube[position]
+        return [
+            {"region": name, "total_cases": cases, "total_deaths": deaths, "total_countries": count}
+            for name, cases, deaths, count in zip(
+                regions.names.tolist(),
+                np.nan_to_num(frame[:, TOTAL_CASES]).astype(np.int64).tolist(),
+                np.nan_to_num(frame[:, TOTAL_DEATHS]).astype(np.int64).tolist(),
+                regions.counts[position].tolist()
+            )
+        ]
+
+    def _metric_summary(self, metric: str, position: int, view: Optional[CubeView] = None) -> Dict:
+        """Sum and mean of a metric over the countries reporting it on one date"""
+        values = np.asarray(self._view_metric(view or self.view(), metric)[position], dtype=np.float64)
+        reporting = values[~np.isnan(values)]
+        return {
+            "name": metric,
+            "total": float(reporting.sum()),
+            "mean": float(reporting.mean()) if len(reporting) else None,
+            "countries_reporting": len(reporting)
+        }
+
+    def _date_range(self, start: Optional[str], end: Optional[str], step: int = 1,
+                    view: Optional[CubeView] = None) -> range:
+        """Cube rows between two dates (inclusive), every `step` rows; buckets count if they overlap the range"""
+        if step < 1:
+            raise ValueError("step must be at least 1")
+        view = view or self.view()
+        first = bisect_left(view.ends, pd.to_datetime(start).strftime("%Y-%m-%d")) if start else 0
+        last = bisect_right(view.dates, pd.to_datetime(end).strftime("%Y-%m-%d")) if end else len(view.dates)
+        return range(first, last, step)
+
+    def _map_frame(self, position: int, view: CubeView, countries: CubeView, columnar: bool,
+                   metric: Optional[str]) -> Dict:
+        """Map data and global totals for one row of a view"""
+        if columnar:
+            columns = self._map_columns(position, metric, view)
+            frame = {"date": view.dates[position], "columns": {k: v.tolist() for k, v in columns.items()}}
+        else:
+            frame = {"date": view.dates[position], "countries": self._map_countries(position, metric, view)}
+        frame.update(self._global_totals(position, countries))
+        if metric is not None:
+            frame["metric"] = self._metric_summary(metric, position, view)
+        return frame
+
+    def playback_dates(self, start: Optional[str] = None, end: Optional[str] = None, step: int = 1,
+                       granularity: str = "day", metric: Optional[str] = None,
+                       group_by: str = "country") -> List[str]:
+        """Labels of the frames a playback from `start` to `end` goes through, checking the metric up front"""
+        view = self.view(granularity, group_by)
+        self._check_view_metric(view, metric)
+        return [view.dates[position] for position in self._date_range(start, end, step, view)]
+
+    def get_map_frame(self, date: str, granularity: str = "day", group_by: str = "country",
+                      metric: Optional[str] = None) -> Dict:
+        """One columnar playback frame: the map data and global totals of the row holding `date`"""
+        view = self.view(granularity, group_by)
+        self._check_view_metric(view, metric)
+        position = self._view_position(view, date)
+        if position is None:
+            raise ValueError(f"No data for {date}")
+        return self._map_frame(position, view, self.view(granularity, "country"), True, metric)
+
+    def get_map_frames(self, dates: List[str], columnar: bool = False, metric: Optional[str] = None,
+                       granularity: str = "day", group_by: str = "country") -> List[Dict]:
+        """Map data and global totals of several rows, labelled as returned by playback_dates"""
+        view = self.view(granularity, group_by)
+        self._check_view_metric(view, metric)
+        countries = self.view(granularity, "country")
+        frames = []
+        for date in dates:
+            position = self._view_position(view, date)
+            if position is None:
+                raise ValueError(f"No data for {date}")
+            frames.append(self._map_frame(position, view, countries, columnar, metric))
+        return frames
+
+    def _country_position(self, country: str) -> int:
+        """Resolve a country name (case-insensitive), ISO alpha-3 code or ISO numeric code to a cube column"""
+        key = country.strip().lower()
+        position = self.country_positions.get(key)
+        if position is None:
+            position = self.code_positions.get(key.upper())
+        if position is None:
+            raise ValueError(f"Country {country} not found")
+        return position
+
+    def get_country_data(self, country_name, days: int = 30, start: Optional[str] = None, end: Optional[str] = None):
         try:
-            country_df = self.df[self.df['location'] == country_name].copy()
-            if country_df.empty:
-                raise ValueError(f"Country {country_name} not found")
-            
+            position = self._country_position(country_name)
+            _, last = self.country_spans[position]
+
             # Get latest data
-            latest = country_df.iloc[-1]
-            
-            # Calculate daily changes
-            country_df.loc[:, 'daily_cases'] = country_df['new_cases'].fillna(0)
-            country_df.loc[:, 'daily_deaths'] = country_df['new_deaths'].fillna(0)
-            
-            # Get last 30 days of data
-            last_30_days = country_df.tail(30).copy()
-            
-            # Ensure we have exactly 30 days of data
-            if len(last_30_days) < 30:
-                # Pad with zeros if we don't have enough data
-                missing_days = 30 - len(last_30_days)
-                padding = pd.DataFrame({
-                    'date': pd.date_range(end=last_30_days['date'].min(), periods=missing_days, freq='D'),
-                    'daily_cases': 0,
-                    'daily_deaths': 0
-                })
-                last_30_days = pd.concat([padding, last_30_days])
-            
+            latest = self.cube[last, position]
+
+            # Window ends at `end` (default: the country's latest row) and covers `days` dates unless `start` is given
+            stop = bisect_right(self.date_strings, pd.to_datetime(end).strftime("%Y-%m-%d")) if end else last + 1
+            begin = bisect_left(self.date_strings, pd.to_datetime(start).strftime("%Y-%m-%d")) if start else stop - days
+            # An end before the first loaded date selects nothing, rather than only padding
+            if stop == 0 or begin >= stop:
+                raise ValueError(f"Empty date range for {country_name}")
+
+            # Pad with zeros before the first loaded date, so `days` always yields that many entries
+            padding = max(0, -begin)
+            begin = max(0, begin)
+            dates = self.date_strings[begin:stop]
+            if padding:
+                dates = [
+                    d.strftime("%Y-%m-%d")
+                    for d in pd.date_range(end=pd.Timestamp(self.date_strings[0]) - pd.Timedelta(days=1), periods=padding)
+                ] + dates
+
+            # Counts and averages are zero where the country has no row, rates are null
+            daily = {}
+            for metric, k in (("new_cases", NEW_CASES), ("new_deaths", NEW_DEATHS)):
+                daily[metric] = np.concatenate([np.zeros(padding), np.nan_to_num(self.cube[begin:stop, position, k])])
+                average = np.nan_to_num(self.derived[f"{metric}_7day_avg"][begin:stop, position])
+                daily[f"{metric}_7day_avg"] = np.concatenate([np.zeros(padding), average])
+            rates = {
+                metric: [None] * padding + [None if np.isnan(v) else v for v in self.derived[metric][begin:stop, position].tolist()]
+                for metric in DERIVED_METRICS if metric not in daily
+            }
+
             return {
-                "country": country_name,
+                "country": self.countries[position],
                 "latest_stats": {
-                    "total_cases": int(latest['total_cases']),
-                    "total_deaths": int(latest['total_deaths']),
-                    "cases_per_million": float(latest['total_cases_per_million']),
-                    "deaths_per_million": float(latest['total_deaths_per_million'])
+                    "total_cases": int(latest[TOTAL_CASES]),
+                    "total_deaths": int(latest[TOTAL_DEATHS]),
+                    "cases_per_million": float(latest[CASES_PER_MILLION]),
+                    "deaths_per_million": float(latest[DEATHS_PER_MILLION])
                 },
                 "daily_data": [
                     {
-                        "date": row['date'].strftime("%Y-%m-%d"),
-                        "new_cases": int(row['daily_cases']),
-                        "new_deaths": int(row['daily_deaths'])
+                        "date": date,
+                        "new_cases": cases,
+                        "new_deaths": deaths,
+                        "new_cases_7day_avg": cases_avg,
+                        "new_deaths_7day_avg": deaths_avg,
+                        **{metric: values[i] for metric, values in rates.items()}
                     }
-                    for _, row in last_30_days.iterrows()
+                    for i, (date, cases, deaths, cases_avg, deaths_avg) in enumerate(zip(
+                        dates,
+                        daily["new_cases"].astype(np.int64).tolist(),
+                        daily["new_deaths"].astype(np.int64).tolist(),
+                        daily["new_cases_7day_avg"].tolist(),
+                        daily["new_deaths_7day_avg"].tolist()
+                    ))
                 ]
             }
         except Exception as e:
             logger.error(f"Error in get_country_data: {e}")
             raise
 
-    def get_top_countries(self):
+    def get_countries_series(self, names: List[str], metric: str = "new_cases", start: Optional[str] = None,
+                             end: Optional[str] = None, granularity: str = "day") -> Dict:
+        """Date-aligned series of one metric for many countries, gathered in a single slice
+
+        Returns one column of dates plus one column per country (null where it has no value).
+        """
         try:
-            latest_date = self.df['date'].max()
-            latest_data = self.df[self.df['date'] == latest_date].copy()
-            
-            # Sort by total cases
-            top_cases = latest_data.nlargest(10, 'total_cases')[['location', 'total_cases', 'total_deaths']]
-            # Sort by total deaths
-            top_deaths = latest_data.nlargest(10, 'total_deaths')[['location', 'total_cases', 'total_deaths']]
-            
-            # Get all countries for the dropdown
-            all_countries = latest_data[['location']].sort_values('location')
-            
-            return {
-                "by_cases": [
-                    {
-                        "country": row['location'],
-                        "cases": int(row['total_cases']),
-                        "deaths": int(row['total_deaths'])
-                    }
-                    for _, row in top_cases.iterrows()
-                ],
-                "by_deaths": [
-                    {
-                        "country": row['location'],
-                        "cases": int(row['total_cases']),
-                        "deaths": int(row['total_deaths'])
-                    }
-                    for _, row in top_deaths.iterrows()
-                ],
-                "all_countries": [
-                    {"name": row['location']}
-                    for _, row in all_countries.iterrows()
-                ]
+            self._check_metric(metric)
+            positions = list(dict.fromkeys(self._country_position(name) for name in names))
+            view = self.view(granularity)
+            rows = self._date_range(start, end, 1, view)
+            values = self._view_metric(view, metric)[rows.start:rows.stop, positions]
+
+            columns = {"date": view.dates[rows.start:rows.stop]}
+            for i, position in enumerate(positions):
+                columns[self.countries[position]] = [None if np.isnan(v) else v for v in values[:, i].tolist()]
+            result = {"metric": metric, "countries": [self.countries[p] for p in positions], "columns": columns}
+            if granularity != "day":
+                result["granularity"] = granularity
+            return result
+        except Exception as e:
+            logger.error(f"Error in get_countries_series: {e}")
+            raise
+
+    def _range_max(self, flow: int, per_country: bool) -> RangeMax:
+        """Sparse table of a flow metric's daily values, per country or for the global daily total"""
+        key = (flow, per_country)
+        table = self.range_max.get(key)
+        if table is None:
+            with self._lazy_lock:
+                table = self.range_max.get(key)
+                if table is None:
+                    table = self.range_max[key] = RangeMax(self._range_max_values(flow, per_country))
+        return table
+
+    def _range_max_values(self, flow: int, per_country: bool) -> np.ndarray:
+        if per_country:
+            return self.cube[:, :, FLOW_INDEXES[flow]]
+        return narrow(np.diff(self.prefix_sums[:, :, flow].sum(axis=1, dtype=np.float64)))
+
+    def get_range_stats(self, start: Optional[str] = None, end: Optional[str] = None,
+                        country: Optional[str] = None) -> Dict:
+        """New cases and deaths over any date range, globally or for one country
+
+        Totals and means come from the prefix sums and maxima from sparse tables, so the cost
+        does not depend on the length of the range.
+        """
+        try:
+            rows = self._date_range(start, end)
+            if not len(rows):
+                raise ValueError(f"No data between {start} and {end}")
+            first, stop = rows.start, rows.stop
+            position = self._country_position(country) if country else None
+
+            window = self.prefix_sums[stop].astype(np.float64) - self.prefix_sums[first]
+            totals = window[position] if position is not None else window.sum(axis=0)
+
+            result = {"from": self.date_strings[first], "to": self.date_strings[stop - 1], "days": stop - first}
+            if position is not None:
+                result["country"] = self.countries[position]
+            for flow, metric in enumerate(FLOW_METRICS):
+                peak = self._range_max(flow, position is not None).query(first, stop)
+                if position is not None:
+                    peak = peak[position]
+                result[metric] = {
+                    "total": int(totals[flow]),
+                    "mean": float(totals[flow]) / (stop - first),
+                    "max": None if np.isnan(peak) else int(peak)
+                }
+            return result
+        except Exception as e:
+            logger.error(f"Error in get_range_stats: {e}")
+            raise
+
+    def _ranked(self, metric: str, position: int, n: int) -> List[Dict]:
+        """Top n countries by a metric on one date, sliced from the precomputed rankings when there is one"""
+        if metric in self.rankings:
+            top = self.rankings[metric][position, :min(n, self.ranked_counts[metric][position])]
+        else:
+            row = self.metric_values(metric)[position]
+            order = np.argsort(-np.nan_to_num(row, nan=-np.inf), kind='stable')
+            top = order[:min(n, np.count_nonzero(~np.isnan(row)))]
+        rows = self.cube[position, top]
+        return [
+            {"country": self.countries[i], "cases": cases, "deaths": deaths, "value": value}
+            for i, cases, deaths, value in zip(
+                top.tolist(),
+                rows[:, TOTAL_CASES].astype(np.int64).tolist(),
+                rows[:, TOTAL_DEATHS].astype(np.int64).tolist(),
+                self.metric_values(metric)[position, top].tolist()
+            )
+        ]
+
+    def get_top_countries(self, date: Optional[str] = None, metric: Optional[str] = None, n: int = 10):
+        try:
+            if metric is not None:
+                self._check_metric(metric)
+            position = self._date_position(date) if date else len(self.date_strings) - 1
+            if position is None:
+                raise ValueError(f"No data for {date}")
+
+            def entries(ranked):
+                return [{key: entry[key] for key in ("country", "cases", "deaths")} for entry in ranked]
+
+            # Get all countries with a row on this date for the dropdown (countries are stored sorted by name)
+            present = np.flatnonzero(~np.isnan(self.cube[position, :, TOTAL_CASES]))
+            result = {
+                "date": self.date_strings[position],
+                "by_cases": entries(self._ranked("total_cases", position, n)),
+                "by_deaths": entries(self._ranked("total_deaths", position, n)),
+                "all_countries": [{"name": self.countries[i]} for i in present.tolist()]
             }
+            if metric is not None:
+                result["ranking"] = {"metric": metric, "countries": self._ranked(metric, position, n)}
+            return result
         except Exception as e:
             logger.error(f"Error in get_top_countries: {e}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,87 @@
+"""
+Derived epidemiological metrics computed once per dataset over the dates x countries matrix
+"""
+from typing import Dict
+import numpy as np
+
+# Days in the rolling averages and week-over-week comparisons
+ROLLING_WINDOW = 7
+
+# Days between an infection and the infections it causes, used by the Rt proxy
+SERIAL_INTERVAL = 4
+
+# Rows of history a derived value depends on: a week-over-week change compares two full weeks
+DERIVED_LOOKBACK = 2 * ROLLING_WINDOW
+
+# Derived metrics, selectable like any other metric
+DERIVED_METRICS = [
+    "new_cases_7day_avg", "new_deaths_7day_avg",
+    "new_cases_wow_growth", "new_deaths_wow_growth",
+    "rt_proxy",
+    "cases_doubling_days", "deaths_doubling_days"
+]
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling mean along the first axis; the first window-1 entries average what is available"""
+    sums = np.cumsum(values, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window).reshape((-1,) + (1,) * (values.ndim - 1))
+    return sums / counts
+
+
+def _trailing_sum(values: np.ndarray, window: int) -> np.ndarray:
+    sums = np.cumsum(values, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums
+
+
+def _lagged(values: np.ndarray, days: int) -> np.ndarray:
+    """Values `days` rows earlier, NaN where that is before the first row"""
+    lagged = np.full_like(values, np.nan)
+    lagged[days:] = values[:-days]
+    return lagged
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, NaN wherever the denominator is not positive"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def compute_derived(new_cases: np.ndarray, new_deaths: np.ndarray, total_cases: np.ndarray,
+                    total_deaths: np.ndarray) -> Dict[str, np.ndarray]:
+    """All derived metrics from dates x countries arrays (NaN where a country has no row)
+
+    - `*_7day_avg`: trailing 7-day mean of the daily counts
+    - `*_wow_growth`: percent change of the last 7 days' count over the 7 days before
+    - `rt_proxy`: 7-day average cases over the same average one serial interval earlier
+    - `*_doubling_days`: days for the cumulative total to double at the past week's growth rate
+    """
+    # Inputs may be stored as float32; every derived value is computed in float64
+    new_cases, new_deaths, total_cases, total_deaths = (
+        np.asarray(values, dtype=np.float64) for values in (new_cases, new_deaths, total_cases, total_deaths)
+    )
+    present = ~np.isnan(total_cases)
+    derived = {}
+
+    for name, daily in (("new_cases", new_cases), ("new_deaths", new_deaths)):
+        daily = np.nan_to_num(daily)
+        derived[f"{name}_7day_avg"] = rolling_mean(daily, ROLLING_WINDOW)
+        week = _trailing_sum(daily, ROLLING_WINDOW)
+        derived[f"{name}_wow_growth"] = _ratio(week, _lagged(week, ROLLING_WINDOW)) * 100 - 100
+
+    cases_avg = derived["new_cases_7day_avg"]
+    derived["rt_proxy"] = _ratio(cases_avg, _lagged(cases_avg, SERIAL_INTERVAL))
+
+    for name, total in (("cases", total_cases), ("deaths", total_deaths)):
+        growth = _ratio(total, _lagged(total, ROLLING_WINDOW))
+        # Only a growing total has a doubling time
+        with np.errstate(divide="ignore", invalid="ignore"):
+            doubling = np.where(growth > 1, ROLLING_WINDOW * np.log(2) / np.log(growth), np.nan)
+        derived[f"{name}_doubling_days"] = doubling
+
+    for values in derived.values():
+        values[~present] = np.nan
+    return derived
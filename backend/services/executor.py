@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Optional, Tuple
+from .data_service import DataService
+from ..metrics import metrics, timed_call
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+# DataService owned by each process-pool worker
+_worker_service: Optional[DataService] = None
+
+
+def _init_worker(csv_path: str, snapshot_path: str):
+    global _worker_service
+    _worker_service = DataService(csv_path, snapshot_path)
+
+
+def _call_worker(method: str, args: tuple) -> Tuple[Any, float]:
+    return timed_call(getattr(_worker_service, method), *args)
+
+
+class ExecutorOverloaded(Exception):
+    """Raised when a DataService call is rejected or times out; surfaced as a 503"""
+    retry_after = 1
+
+
+class DatasetNotReady(ExecutorOverloaded):
+    """Raised while the initial dataset is still loading"""
+    retry_after = 5
+
+
+class DatasetReloaded(ExecutorOverloaded):
+    """Raised when a call pinned to a dataset reaches process workers that already serve its replacement"""
+
+
+class DataExecutor:
+    """Dispatch DataService calls off the event loop with bounded concurrency
+
+    mode "inline" calls the service directly (the old behaviour), "thread" uses a
+    thread pool sharing this process's service, and "process" uses a process pool
+    where each worker loads its own copy of the dataset.
+
+    The service may be None until the initial load finishes; swap() installs it.
+    """
+
+    def __init__(self, service: Optional[DataService], mode: str = "thread", workers: int = 4,
+                 max_pending: int = 64, timeout: float = 10.0):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode {mode!r}, expected one of {EXECUTOR_MODES}")
+        self.service = service
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.rejected = 0
+        self._pool = self._create_pool()
+        logger.info(f"DataService executor: mode={mode}, workers={workers}, max_pending={max_pending}, timeout={timeout}s")
+
+    @classmethod
+    def from_env(cls, service: Optional[DataService] = None) -> "DataExecutor":
+        """Build an executor configured by COVID_EXECUTOR_* environment variables"""
+        return cls(
+            service,
+            mode=os.environ.get("COVID_EXECUTOR_MODE", "thread"),
+            workers=int(os.environ.get("COVID_EXECUTOR_WORKERS", "4")),
+            max_pending=int(os.environ.get("COVID_EXECUTOR_MAX_PENDING", "64")),
+            timeout=float(os.environ.get("COVID_EXECUTOR_TIMEOUT", "10"))
+        )
+
+    def _create_pool(self):
+        if self.mode == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="data-service")
+        if self.mode == "process" and self.service is not None:
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.service.csv_path, self.service.snapshot_path)
+            )
+        return None
+
+    async def run(self, method: str, *args, service: Optional[DataService] = None) -> Any:
+        """Call a DataService method, rejecting with ExecutorOverloaded when the queue is full or the call is too slow
+
+        `service` pins the call to a dataset read earlier, e.g. the one whose version keys a cached
+        response, so a swap in between cannot mix the two.
+        """
+        service = service or self.service
+        if service is None:
+            raise DatasetNotReady("Dataset is still loading")
+        if self.mode == "inline":
+            return self._record(method, timed_call(getattr(service, method), *args))
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorOverloaded(f"Server busy: {self.pending} requests already queued")
+
+        if self.mode == "thread":
+            future = self._pool.submit(partial(timed_call, getattr(service, method), *args))
+        elif service is not self.service:
+            # Process workers only hold the current dataset
+            raise DatasetReloaded(f"Dataset was reloaded while handling {method}")
+        else:
+            future = self._pool.submit(_call_worker, method, args)
+
+        # A timed-out call keeps its worker busy, so its slot is only released once the pool is done with it
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: self._release(loop))
+        try:
+            return self._record(method, await asyncio.wait_for(asyncio.wrap_future(future), self.timeout))
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExecutorOverloaded(f"{method} timed out after {self.timeout}s")
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        """Free a pending slot from the pool's thread, on the event loop that took it"""
+        def release():
+            self.pending -= 1
+
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            # The loop has already shut down
+            pass
+
+    def _record(self, method: str, timed: Tuple[Any, float]) -> Any:
+        result, elapsed = timed
+        metrics.observe("covid_data_service_seconds", elapsed, method=method)
+        return result
+
+    async def swap(self, service: DataService):
+        """Atomically switch to a new DataService; in-flight calls finish on the old one"""
+        old_pool = self._pool
+        if self.mode == "process":
+            # Start and warm the new workers before routing any traffic to them
+            new_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(service.csv_path, service.snapshot_path)
+            )
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(new_pool, _call_worker, "get_dates", ()) for _ in range(self.workers)
+            ))
+            self._pool = new_pool
+            if old_pool is not None:
+                old_pool.shutdown(wait=False)
+        self.service = service
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
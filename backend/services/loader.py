@@ -0,0 +1,59 @@
+from typing import Dict, Optional
+from .data_service import DataService
+from .executor import DataExecutor
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetLoader:
+    """Load the initial DataService in the background and track its phase for readiness probes"""
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self.phase = "pending"
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == "ready"
+
+    def _report(self, phase: str, fraction: float):
+        # Called from the loading thread; plain attribute writes are enough for a status probe
+        self.phase = phase
+        self.progress = fraction
+
+    async def load(self, executor: DataExecutor):
+        """Build the DataService off the event loop and hand it to the executor"""
+        self.started_at = time.time()
+        self._report("starting", 0.0)
+        try:
+            service = await asyncio.to_thread(DataService, self.csv_path, progress=self._report)
+            self._report("starting_workers", 0.95)
+            await executor.swap(service)
+        except Exception as e:
+            self.phase = "failed"
+            self.error = str(e)
+            logger.error(f"Initial dataset load failed: {e}")
+            return
+        finally:
+            self.finished_at = time.time()
+        self._report("ready", 1.0)
+        logger.info(f"Dataset ready after {self.finished_at - self.started_at:.1f}s")
+
+    def status(self) -> Dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "ready": self.ready,
+            "phase": self.phase,
+            "progress": round(self.progress, 2),
+            "elapsed_s": None if elapsed is None else round(elapsed, 3),
+            "error": self.error
+        }
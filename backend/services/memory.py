@@ -0,0 +1,107 @@
+"""
+Compact column types for the cleaned frame and a per-structure account of the bytes a DataService holds
+"""
+import mmap
+import sys
+from typing import Dict, Iterable, List
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def date_ordinals(dates) -> np.ndarray:
+    """Days since 1970-01-01 of ISO date strings or timestamps, as int32"""
+    days = pd.to_datetime(pd.Series(dates), format="%Y-%m-%d").to_numpy(dtype="datetime64[D]")
+    return (days - EPOCH).astype(np.int32)
+
+
+def ordinal_dates(days: Iterable[int]) -> List[str]:
+    """ISO date strings of day ordinals"""
+    return (EPOCH + np.asarray(days, dtype="timedelta64[D]")).astype(str).tolist()
+
+
+def index_type(largest: int) -> type:
+    """Smallest signed integer type holding indexes and counts up to `largest`"""
+    return np.int16 if largest < np.iinfo(np.int16).max else np.int32
+
+
+def narrow(values: np.ndarray) -> np.ndarray:
+    """A float64 array as float32 if that round-trips every value exactly, otherwise unchanged"""
+    if values.dtype != np.float64:
+        return values
+    narrowed = values.astype(np.float32)
+    return narrowed if np.array_equal(narrowed, values, equal_nan=True) else values
+
+
+def downcast_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Store float64 columns as float32 in place wherever that round-trips every value exactly"""
+    for col in df.columns:
+        values = df[col].to_numpy()
+        narrowed = narrow(values)
+        if narrowed is not values:
+            df[col] = narrowed
+    return df
+
+
+class MetricCube:
+    """Dates x countries x metrics data kept as one array per metric, each float32 where that is exact
+
+    Indexes like the 3-D float64 array it replaces: cube[..., ..., k] is a view of metric k's own
+    array, in its stored type; any other selection is assembled as float64.
+    """
+
+    def __init__(self, metrics: List[np.ndarray]):
+        self.metrics = metrics
+
+    @classmethod
+    def compact(cls, block: np.ndarray) -> "MetricCube":
+        """Split a 3-D float64 block into narrowed per-metric arrays"""
+        return cls([narrow(block[:, :, k]) for k in range(block.shape[2])])
+
+    def extend(self, block: np.ndarray) -> "MetricCube":
+        """This cube with the rows of a 3-D block appended; a metric stays float32 only if both parts are"""
+        return MetricCube([np.concatenate([values, narrow(block[:, :, k])]) for k, values in enumerate(self.metrics)])
+
+    @property
+    def shape(self) -> tuple:
+        return self.metrics[0].shape + (len(self.metrics),)
+
+    def __len__(self) -> int:
+        return len(self.metrics[0])
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        cells, metric = key[:2], key[2] if len(key) > 2 else slice(None)
+        if isinstance(metric, (int, np.integer)):
+            return self.metrics[metric][cells]
+        chosen = self.metrics[metric] if isinstance(metric, slice) else [self.metrics[k] for k in metric]
+        return np.stack([np.asarray(values[cells], dtype=np.float64) for values in chosen], axis=-1)
+
+
+def is_mapped(values: np.ndarray) -> bool:
+    """True if an array's memory is a file mapping shared with other processes"""
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return isinstance(values, mmap.mmap)
+
+
+def array_usage(name: str, values: np.ndarray) -> Dict:
+    """Bytes, type and sharing of one array"""
+    return {
+        "name": name,
+        "dtype": str(values.dtype),
+        "shape": list(values.shape),
+        "bytes": int(values.nbytes),
+        "shared": is_mapped(values)
+    }
+
+
+def object_usage(name: str, value) -> Dict:
+    """Approximate bytes of a list or dict of small Python objects, counting keys and items once"""
+    size = sys.getsizeof(value)
+    items = value.keys() if isinstance(value, dict) else value
+    size += sum(sys.getsizeof(item) for item in items)
+    return {"name": name, "dtype": "object", "shape": [len(value)], "bytes": size, "shared": False}
@@ -0,0 +1,38 @@
+"""
+Constant-time aggregates over arbitrary date ranges: prefix sums for totals and means, a sparse table for maxima
+"""
+from typing import Optional
+import numpy as np
+
+
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Cumulative sums along the first axis with a leading zero row, so rows [a, b) sum to P[b] - P[a]"""
+    sums = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(np.nan_to_num(values), axis=0, out=sums[1:])
+    return sums
+
+
+class RangeMax:
+    """Sparse table answering the maximum over any range of rows with two lookups
+
+    Level k holds the maximum of each run of 2**k rows; any range is covered by two
+    (possibly overlapping) runs of the largest power of two that fits. NaN is ignored.
+    """
+
+    def __init__(self, values: np.ndarray, previous: Optional["RangeMax"] = None):
+        """`previous`, a table over the leading rows of `values`, supplies the runs that end before the new rows"""
+        self.levels = [values]
+        width = 1
+        while width * 2 <= len(values):
+            level = self.levels[-1]
+            k = len(self.levels)
+            reused = previous.levels[k] if previous is not None and k < len(previous.levels) else level[:0]
+            start = len(reused)
+            self.levels.append(np.concatenate([reused, np.fmax(level[start:-width], level[start + width:])]))
+            width *= 2
+
+    def query(self, first: int, stop: int) -> np.ndarray:
+        """Maximum over rows [first, stop)"""
+        k = (stop - first).bit_length() - 1
+        level = self.levels[k]
+        return np.fmax(level[first], level[stop - (1 << k)])
@@ -0,0 +1,69 @@
+from typing import Callable, Optional
+from .data_service import DataService
+from .executor import DataExecutor
+from .snapshot import dataset_version
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetReloader:
+    """Poll the source CSV and hot-swap a freshly loaded DataService when it changes"""
+
+    def __init__(self, executor: DataExecutor, interval: float = 60.0,
+                 on_swap: Optional[Callable[[DataService], None]] = None):
+        self.executor = executor
+        self.interval = interval
+        self.on_swap = on_swap
+        self.reloads = 0
+        self._task: Optional[asyncio.Task] = None
+        self._seen_version: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, executor: DataExecutor, on_swap=None) -> "DatasetReloader":
+        """Build a reloader polling every COVID_RELOAD_INTERVAL seconds (0 disables it)"""
+        return cls(executor, float(os.environ.get("COVID_RELOAD_INTERVAL", "60")), on_swap)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Dataset reload failed, keeping the current dataset: {e}")
+
+    async def check(self) -> bool:
+        """Reload if the source changed and has been stable for one poll; True if a swap happened"""
+        current = self.executor.service
+        if current is None:
+            return False
+        version = dataset_version(current.csv_path)
+        if version == current.version:
+            self._seen_version = None
+            return False
+
+        # Wait for the file to stop changing so we never parse a half-written CSV
+        if version != self._seen_version:
+            self._seen_version = version
+            return False
+
+        logger.info(f"Dataset {current.csv_path} changed, loading version {version}")
+        service = await asyncio.to_thread(DataService, current.csv_path, current.snapshot_path, current)
+        await self.executor.swap(service)
+        self._seen_version = None
+        self.reloads += 1
+        if self.on_swap is not None:
+            self.on_swap(service)
+        logger.info(f"Swapped in dataset version {service.version}")
+        return True
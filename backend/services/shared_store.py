@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from typing import Dict, Optional
+import json
+import logging
+import numpy as np
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock, every worker may build
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Directory layout: <csv>.store/<dataset version>-<store format>/{meta.json, <array>.npy}
+META_FILE = "meta.json"
+
+# Bump when the set of published arrays changes, so stores written by older code are rebuilt
+STORE_FORMAT = 4
+
+
+def default_store_root(csv_path: str) -> str:
+    """Shared array store kept next to the source CSV"""
+    return f"{csv_path}.store"
+
+
+def _version_dir(root: str, version: str) -> str:
+    return os.path.join(root, f"{version}-{STORE_FORMAT}")
+
+
+@contextmanager
+def build_lock(root: str):
+    """Exclusive lock so only one process builds a store version while the others wait to attach"""
+    try:
+        os.makedirs(root, exist_ok=True)
+        lock_file = open(os.path.join(root, ".lock"), "w")
+    except OSError as e:
+        # Read-only location: build without coordination, publishing will fail and fall back too
+        logger.warning(f"Could not lock shared store {root}: {e}")
+        yield
+        return
+
+    with lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def attach(root: str, version: str) -> Optional[Dict]:
+    """Memory-map a published store version read-only; None if it does not exist yet
+
+    Every process attaching to the same version shares the arrays through the page cache.
+    """
+    path = _version_dir(root, version)
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+    return {"meta": meta, "arrays": arrays}
+
+
+def publish(root: str, version: str, meta: Dict, arrays: Dict[str, np.ndarray]):
+    """Write a store version atomically and remove older versions"""
+    path = _version_dir(root, version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(tmp_path, META_FILE), "w") as f:
+        json.dump(dict(meta, arrays=list(arrays)), f)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process published this version first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return
+
+    # Processes still mapping an old version keep their pages until they swap
+    for entry in os.listdir(root):
+        if entry not in (os.path.basename(path), ".lock") and not entry.endswith(".tmp"):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+def load_array(root: str, version: str, name: str) -> Optional[np.ndarray]:
+    """Memory-map one array added to a published version after the fact, if present"""
+    path = os.path.join(_version_dir(root, version), f"{name}.npy")
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def save_array(root: str, version: str, name: str, values: np.ndarray):
+    """Add an array to an already published version (e.g. a lazily loaded metric)"""
+    path = _version_dir(root, version)
+    if not os.path.isdir(path):
+        return
+    tmp_file = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+    np.save(tmp_file, np.ascontiguousarray(values))
+    os.replace(tmp_file, os.path.join(path, f"{name}.npy"))
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import logging
+import os
+from typing import BinaryIO, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cleaned frame layout changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+# Bytes read at a time when hashing the source CSV
+HASH_CHUNK = 1 << 20
+
+
+def default_snapshot_path(csv_path: str) -> str:
+    """Snapshot file stored next to the source CSV"""
+    return f"{csv_path}.snapshot.npz"
+
+
+def source_key(csv_path: str) -> np.ndarray:
+    """Identify a version of the source CSV by its size and modification time"""
+    stat = os.stat(csv_path)
+    return np.array([SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def dataset_version(csv_path: str) -> str:
+    """Short identifier for the loaded dataset, used in ETags and cache keys"""
+    return hashlib.sha1(source_key(csv_path).tobytes()).hexdigest()[:12]
+
+
+def _hash_file(f: BinaryIO, hasher, limit: Optional[int] = None) -> bytes:
+    """Feed the next `limit` bytes of a file (default: the rest) to a hash; returns the last chunk read"""
+    last = b""
+    while limit is None or limit > 0:
+        chunk = f.read(HASH_CHUNK if limit is None else min(HASH_CHUNK, limit))
+        if not chunk:
+            break
+        hasher.update(chunk)
+        last = chunk
+        if limit is not None:
+            limit -= len(chunk)
+    return last
+
+
+def source_fingerprint(csv_path: str) -> Tuple[int, str]:
+    """Size and SHA-1 of the source CSV, kept so a reload can tell whether rows were only appended"""
+    hasher = hashlib.sha1()
+    with open(csv_path, "rb") as f:
+        _hash_file(f, hasher)
+        return f.tell(), hasher.hexdigest()
+
+
+def read_appended(csv_path: str, size: int, digest: str) -> Optional[Tuple[bytes, bytes, str]]:
+    """Header line, the bytes after offset `size` and the new SHA-1 of the source CSV
+
+    None unless its first `size` bytes still hash to `digest` and end a line, i.e. the file
+    was only appended to since it was fingerprinted.
+    """
+    hasher = hashlib.sha1()
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        f.seek(0)
+        last = _hash_file(f, hasher, size)
+        if f.tell() != size or not last.endswith(b"\n") or hasher.hexdigest() != digest:
+            return None
+        appended = f.read()
+    hasher.update(appended)
+    return header, appended, hasher.hexdigest()
+
+
+def load_snapshot(csv_path: str, snapshot_path: str) -> Optional[pd.DataFrame]:
+    """Load the cleaned frame from a snapshot, or None if it is missing or stale"""
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        with np.load(snapshot_path, allow_pickle=False) as snapshot:
+            if not np.array_equal(snapshot["__source_key__"], source_key(csv_path)):
+                logger.info(f"Snapshot {snapshot_path} is stale, rebuilding")
+                return None
+            columns = [str(col) for col in snapshot["__columns__"]]
+            return pd.DataFrame({col: _column(snapshot, col) for col in columns})
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+        return None
+
+
+def _column(snapshot, col: str):
+    categories = f"__categories__{col}"
+    if categories in snapshot.files:
+        return pd.Categorical.from_codes(snapshot[col], snapshot[categories])
+    return snapshot[col]
+
+
+def save_snapshot(csv_path: str, snapshot_path: str, df: pd.DataFrame):
+    """Persist the cleaned frame as a columnar NumPy archive keyed by the source CSV"""
+    arrays = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Categoricals keep their compact codes; the labels are stored once
+            arrays[col] = df[col].cat.codes.to_numpy()
+            arrays[f"__categories__{col}"] = df[col].cat.categories.to_numpy(dtype=str)
+        else:
+            arrays[col] = df[col].to_numpy(dtype=str) if df[col].dtype == object else df[col].to_numpy()
+    arrays["__columns__"] = np.array(df.columns, dtype=str)
+    arrays["__source_key__"] = source_key(csv_path)
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, snapshot_path)
+    except OSError as e:
+        logger.warning(f"Could not write snapshot {snapshot_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
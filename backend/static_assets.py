@@ -0,0 +1,77 @@
+"""
+Serve the fingerprinted, pre-compressed dashboard assets written by build_assets.py
+"""
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Scope
+from typing import Dict, Iterable, List
+import json
+import os
+
+# Original asset path -> fingerprinted path, written next to the built assets
+ASSET_MANIFEST = "asset-manifest.json"
+
+# Content-Encoding and file suffix of each pre-compressed variant, most preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# Fingerprinted files change name whenever their content does
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def load_asset_manifest(directory: str) -> Dict[str, str]:
+    path = os.path.join(directory, ASSET_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Encodings an Accept-Encoding header allows, ignoring those with q=0"""
+    accepted = []
+    for part in header.split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        q = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            allowed = float(q) > 0
+        except ValueError:
+            allowed = True
+        if name and allowed:
+            accepted.append(name.lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving the .br or .gz sibling of a file when the client accepts it
+
+    Fingerprinted assets are sent with an immutable Cache-Control; anything else must be revalidated.
+    """
+
+    def __init__(self, *, directory: str, immutable: Iterable[str] = (), **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.immutable = {os.path.normpath(path) for path in immutable}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                continue
+            if variant.status_code in (200, 304):
+                # The content type is guessed from the name without its .br/.gz suffix
+                response = variant
+                response.headers["content-encoding"] = encoding
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE if os.path.normpath(path) in self.immutable else REVALIDATE
+        return response
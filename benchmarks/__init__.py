@@ -0,0 +1,3 @@
+"""
+Benchmarks and load tests for the COVID-19 Dashboard backend
+"""
@@ -0,0 +1,72 @@
+"""
+Run the benchmark suite and save the results as JSON
+
+    python -m benchmarks --countries 190 --dates 1400 --out bench-results/run.json
+    python -m benchmarks.compare bench-results/before.json bench-results/after.json
+"""
+from . import bench_data_service
+from .synthetic_data import generate, FILLER_COLUMNS
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataService and the API under playback load")
+    parser.add_argument("--csv", help="Existing OWID CSV to use instead of generating one")
+    parser.add_argument("--countries", type=int, default=190)
+    parser.add_argument("--dates", type=int, default=1400)
+    parser.add_argument("--subnational", type=int, default=0)
+    parser.add_argument("--filler-columns", type=int, default=len(FILLER_COLUMNS))
+    parser.add_argument("--calls", type=int, default=500, help="Calls per micro-benchmark")
+    parser.add_argument("--viewers", type=int, default=20, help="Concurrent playback viewers in the load test")
+    parser.add_argument("--frames", type=int, default=100, help="Dates each viewer steps through")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache during the load test")
+    parser.add_argument("--skip-load-test", action="store_true")
+    parser.add_argument("--out", default=f"bench-results/{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="covid-bench-")
+    csv_path = args.csv or os.path.join(workdir, "owid-covid-data.csv")
+    if not args.csv:
+        generate(csv_path, args.countries, args.dates, args.subnational, args.filler_columns)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "data_service": bench_data_service.run(csv_path, args.calls),
+    }
+
+    if not args.skip_load_test:
+        from . import load_test
+        os.environ["COVID_DATA_PATH"] = csv_path
+        os.environ.setdefault("COVID_RELOAD_INTERVAL", "0")
+        results["load_test"] = load_test.run(args.viewers, args.frames, not args.no_cache)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
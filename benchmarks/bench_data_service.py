@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks for DataService load and query methods
+"""
+from backend.services.data_service import DataService
+from typing import Callable, Dict, List
+import os
+import random
+import shutil
+import tempfile
+import time
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Latency statistics in milliseconds"""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "n": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": pick(0.5),
+        "p99_ms": pick(0.99),
+    }
+
+
+def measure(func: Callable, calls: List[tuple]) -> Dict:
+    samples = []
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def bench_load(csv_path: str, repeat: int = 3) -> Dict:
+    """Time a cold load (CSV parse), a warm load (snapshot present) and an attach to the shared store
+
+    The store lives in a private temporary directory and is removed before every cold and warm
+    load, so those never silently turn into store attaches.
+    """
+    snapshot_path = f"{csv_path}.bench-snapshot.npz"
+    store_root = tempfile.mkdtemp(prefix="covid-bench-store-")
+    cold, warm, attach = [], [], []
+    try:
+        for _ in range(repeat):
+            _remove(snapshot_path)
+            _remove(store_root)
+            start = time.perf_counter()
+            DataService(csv_path, snapshot_path, store_root=store_root)
+            cold.append(time.perf_counter() - start)
+
+            _remove(store_root)
+            start = time.perf_counter()
+            DataService(csv_path, snapshot_path, store_root=store_root)
+            warm.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            DataService(csv_path, snapshot_path, store_root=store_root)
+            attach.append(time.perf_counter() - start)
+    finally:
+        _remove(snapshot_path)
+        _remove(store_root)
+    return {"load_cold": summarize(cold), "load_warm": summarize(warm), "load_attach": summarize(attach)}
+
+
+def bench_queries(service: DataService, calls: int = 500, seed: int = 0) -> Dict:
+    """Time each query method over random dates and countries"""
+    rng = random.Random(seed)
+    dates = [rng.choice(service.date_strings) for _ in range(calls)]
+    countries = [rng.choice(service.countries) for _ in range(calls)]
+    return {
+        "get_map_data": measure(service.get_map_data, [(d,) for d in dates]),
+        "get_global_stats": measure(service.get_global_stats, [(d,) for d in dates]),
+        "get_country_data": measure(service.get_country_data, [(c,) for c in countries]),
+        "get_top_countries": measure(service.get_top_countries, [(d,) for d in dates]),
+    }
+
+
+def run(csv_path: str, calls: int = 500, load_repeat: int = 3) -> Dict:
+    results = bench_load(csv_path, load_repeat)
+    snapshot_path = f"{csv_path}.bench-snapshot.npz"
+    store_root = tempfile.mkdtemp(prefix="covid-bench-store-")
+    try:
+        service = DataService(csv_path, snapshot_path, store_root=store_root)
+        results.update(bench_queries(service, calls))
+    finally:
+        _remove(snapshot_path)
+        _remove(store_root)
+    return results
@@ -0,0 +1,36 @@
+"""
+Compare two saved benchmark runs
+
+    python -m benchmarks.compare before.json after.json
+"""
+import json
+import sys
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_rps")):
+            yield f"{prefix}{key}", value
+
+
+def main(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = dict(flatten(json.load(f)))
+    with open(after_path) as f:
+        after = dict(flatten(json.load(f)))
+
+    print(f"{'metric':<45} {'before':>12} {'after':>12} {'change':>9}")
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{name:<45} {old:>12.3f} {new:>12.3f} {change:>9}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BEFORE.json AFTER.json")
+    main(sys.argv[1], sys.argv[2])
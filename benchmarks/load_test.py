@@ -0,0 +1,62 @@
+"""
+In-process load harness replaying the dashboard's slider-playback request pattern
+"""
+from .bench_data_service import summarize
+from typing import Dict, List
+import asyncio
+import time
+
+
+async def _viewer(client, dates: List[str], latencies: List[float], errors: List[int]):
+    """One viewer stepping through the timeline the way dashboard.js does for each date"""
+    for date in dates:
+        for url in (f"/api/map-data/{date}?format=columnar", f"/api/global-stats?date={date}"):
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+
+async def _run(app, viewers: int, frames: int) -> Dict:
+    import httpx
+    from backend.routers import covid_router
+
+    # ASGITransport does not run the app lifespan, so load the dataset here
+    await covid_router.loader.load(covid_router.executor)
+    if not covid_router.loader.ready:
+        raise RuntimeError(f"Dataset failed to load: {covid_router.loader.error}")
+    dates = covid_router.executor.service.get_dates()
+    latencies, errors = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Viewers start at spread-out dates so they do not all replay the same frames
+        offsets = [i * max(1, len(dates) // max(1, viewers)) for i in range(viewers)]
+        sessions = [(dates[offset:] + dates[:offset])[:frames] for offset in offsets]
+        start = time.perf_counter()
+        await asyncio.gather(*(_viewer(client, session, latencies, errors) for session in sessions))
+        elapsed = time.perf_counter() - start
+
+    result = summarize(latencies)
+    result.update({
+        "viewers": viewers,
+        "frames_per_viewer": frames,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+    })
+    return result
+
+
+def run(viewers: int = 20, frames: int = 100, use_cache: bool = True) -> Dict:
+    """Drive main.app with concurrent playback viewers; COVID_DATA_PATH selects the dataset"""
+    import main
+    from backend.routers import covid_router
+
+    if not use_cache:
+        covid_router.response_cache.max_entries = 0
+    try:
+        return asyncio.run(_run(main.app, viewers, frames))
+    finally:
+        covid_router.executor.shutdown()
@@ -0,0 +1,125 @@
+"""
+Generate synthetic OWID-shaped CSVs at configurable scale
+"""
+from backend.services.aggregation import WHO_REGIONS
+from backend.services.data_service import SOVEREIGN_STATES, COLUMNS
+import argparse
+import numpy as np
+import pandas as pd
+
+# OWID continent of each WHO region, and of the countries whose continent differs from their region's
+REGION_CONTINENTS = {"AFR": "Africa", "AMR": "North America", "SEAR": "Asia", "EUR": "Europe", "EMR": "Asia", "WPR": "Asia"}
+CONTINENT_OVERRIDES = {
+    **dict.fromkeys(['ARG', 'BOL', 'BRA', 'CHL', 'COL', 'ECU', 'GUY', 'PRY', 'PER', 'SUR', 'URY', 'VEN'], "South America"),
+    **dict.fromkeys(['DJI', 'EGY', 'LBY', 'MAR', 'SOM', 'SDN', 'TUN'], "Africa"),
+    **dict.fromkeys(['ARM', 'AZE', 'CYP', 'GEO', 'ISR', 'KAZ', 'KGZ', 'TJK', 'TUR', 'TKM', 'UZB'], "Asia"),
+    **dict.fromkeys(['AUS', 'FJI', 'KIR', 'MHL', 'FSM', 'NRU', 'NZL', 'PLW', 'PNG', 'WSM', 'SLB', 'TON', 'TUV', 'VUT'], "Oceania"),
+}
+CONTINENTS = {iso: CONTINENT_OVERRIDES.get(iso, REGION_CONTINENTS[region]) for region, isos in WHO_REGIONS.items() for iso in isos}
+
+# Values OWID uses in tests_units
+TESTS_UNITS = ["tests performed", "people tested", "samples tested", "units unclear"]
+
+# Other columns found in the real OWID file, filled with noise so parsing costs stay realistic
+FILLER_COLUMNS = [
+    "continent", "new_cases_smoothed", "new_deaths_smoothed", "new_cases_per_million",
+    "new_cases_smoothed_per_million", "new_deaths_per_million", "new_deaths_smoothed_per_million",
+    "reproduction_rate", "icu_patients", "icu_patients_per_million", "hosp_patients",
+    "hosp_patients_per_million", "weekly_icu_admissions", "weekly_icu_admissions_per_million",
+    "weekly_hosp_admissions", "weekly_hosp_admissions_per_million", "total_tests", "new_tests",
+    "total_tests_per_thousand", "new_tests_per_thousand", "new_tests_smoothed",
+    "new_tests_smoothed_per_thousand", "positive_rate", "tests_per_case", "tests_units",
+    "total_vaccinations", "people_vaccinated", "people_fully_vaccinated", "total_boosters",
+    "new_vaccinations", "new_vaccinations_smoothed", "total_vaccinations_per_hundred",
+    "people_vaccinated_per_hundred", "people_fully_vaccinated_per_hundred",
+    "total_boosters_per_hundred", "new_vaccinations_smoothed_per_million",
+    "new_people_vaccinated_smoothed", "new_people_vaccinated_smoothed_per_hundred",
+    "stringency_index", "population_density", "median_age", "aged_65_older", "aged_70_older",
+    "gdp_per_capita", "extreme_poverty", "cardiovasc_death_rate", "diabetes_prevalence",
+    "female_smokers", "male_smokers", "handwashing_facilities", "hospital_beds_per_thousand",
+    "life_expectancy", "human_development_index", "excess_mortality_cumulative_absolute",
+    "excess_mortality_cumulative", "excess_mortality", "excess_mortality_cumulative_per_million"
+]
+
+
+def generate(path: str, countries: int = 190, dates: int = 1400, subnational: int = 0,
+             filler_columns: int = len(FILLER_COLUMNS), end_date: str = "2023-12-31", seed: int = 0) -> pd.DataFrame:
+    """Write an OWID-shaped CSV and return the frame
+
+    countries: sovereign states, taken from SOVEREIGN_STATES (at most its length)
+    dates: days per location, ending at end_date
+    subnational: extra regions per country with non-sovereign codes, dropped by the loader
+    filler_columns: how many of the other OWID columns to include
+    """
+    rng = np.random.default_rng(seed)
+    isos = list(SOVEREIGN_STATES[:countries])
+    locations = [(iso, f"Country {iso}") for iso in isos]
+    locations += [(f"{iso}-R{k}", f"Country {iso} Region {k}") for iso in isos for k in range(subnational)]
+
+    n_locations, day_index = len(locations), pd.date_range(end=end_date, periods=dates)
+    t = np.arange(dates)
+
+    # Waves of new cases per location, starting at a staggered date
+    population = rng.integers(10_000, 300_000_000, n_locations).astype(np.float64)
+    phase = rng.uniform(0, 2 * np.pi, (n_locations, 1))
+    period = rng.uniform(90, 240, (n_locations, 1))
+    rate = population[:, None] * 2e-4 * (1 + np.sin(2 * np.pi * t / period + phase)) ** 2
+    new_cases = rng.poisson(rate).astype(np.float64)
+    new_deaths = rng.binomial(new_cases.astype(np.int64), 0.01).astype(np.float64)
+    starts = rng.integers(0, max(1, dates // 3), n_locations)
+    present = t[None, :] >= starts[:, None]
+    new_cases[~present] = 0
+    new_deaths[~present] = 0
+
+    total_cases = np.cumsum(new_cases, axis=1)
+    total_deaths = np.cumsum(new_deaths, axis=1)
+    # OWID leaves some daily values blank
+    new_cases[rng.random(new_cases.shape) < 0.02] = np.nan
+
+    rows = present.ravel()
+    frame = {
+        "iso_code": np.repeat([iso for iso, _ in locations], dates)[rows],
+        "location": np.repeat([name for _, name in locations], dates)[rows],
+        "date": np.tile(day_index.strftime("%Y-%m-%d"), n_locations)[rows],
+        "total_cases": total_cases.ravel()[rows],
+        "new_cases": new_cases.ravel()[rows],
+        "total_deaths": total_deaths.ravel()[rows],
+        "new_deaths": new_deaths.ravel()[rows],
+        "population": np.repeat(population, dates)[rows],
+    }
+    frame["total_cases_per_million"] = frame["total_cases"] / frame["population"] * 1e6
+    frame["total_deaths_per_million"] = frame["total_deaths"] / frame["population"] * 1e6
+
+    for name in FILLER_COLUMNS[:filler_columns]:
+        if name == "continent":
+            # Regions share their country's continent
+            frame[name] = np.repeat([CONTINENTS.get(iso[:3], "Asia") for iso, _ in locations], dates)[rows]
+            continue
+        if name == "tests_units":
+            # One unit per location, blank on about half of its rows like the other filler columns
+            units = np.array(TESTS_UNITS, dtype=object)[rng.integers(0, len(TESTS_UNITS), n_locations)]
+            values = np.repeat(units, dates)[rows]
+            values[rng.random(rows.sum()) < 0.5] = None
+            frame[name] = values
+            continue
+        values = rng.random(rows.sum()) * 100
+        values[rng.random(rows.sum()) < 0.5] = np.nan
+        frame[name] = values
+
+    df = pd.DataFrame(frame)
+    assert all(col in df.columns for col in COLUMNS)
+    df.to_csv(path, index=False, float_format="%.10g")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic OWID-shaped CSV")
+    parser.add_argument("path")
+    parser.add_argument("--countries", type=int, default=190)
+    parser.add_argument("--dates", type=int, default=1400)
+    parser.add_argument("--subnational", type=int, default=0)
+    parser.add_argument("--filler-columns", type=int, default=len(FILLER_COLUMNS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    df = generate(args.path, args.countries, args.dates, args.subnational, args.filler_columns, seed=args.seed)
+    print(f"Wrote {len(df)} rows x {len(df.columns)} columns to {args.path}")
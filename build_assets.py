@@ -0,0 +1,98 @@
+"""
+Build content-hashed, pre-compressed copies of the dashboard's static assets
+
+    python build_assets.py [--src static] [--out static_build]
+
+Each CSS and JS file is written as <name>.<hash>.<ext> with .gz (and, when the brotli package is
+installed, .br) variants, and index.html is rewritten to reference the hashed names. main.py serves
+the build directory when it exists, so rerun this after editing anything under static/.
+"""
+from backend.static_assets import ASSET_MANIFEST
+from typing import Dict
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+
+# Brotli is optional; without it only gzip variants are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINTED = (".css", ".js")
+
+
+def fingerprint(relative: str, body: bytes) -> str:
+    """styles.css -> styles.<first 12 hex digits of its SHA-256>.css"""
+    stem, ext = os.path.splitext(relative)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+
+
+def _write(path: str, body: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def write_variants(path: str, body: bytes):
+    """Write a file with its compressed variants, skipping any that would not be smaller"""
+    _write(path, body)
+    variants = {".gz": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(body, quality=11)
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(body):
+            _write(path + suffix, compressed)
+
+
+def build(src: str = "static", out: str = "static_build") -> Dict[str, str]:
+    """Fingerprint and compress every asset under src into out; returns original -> hashed paths
+
+    Files from earlier builds are kept, so pages still holding an old index.html can load their assets.
+    """
+    manifest = {}
+    for directory, _, names in os.walk(src):
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, src).replace(os.sep, "/")
+            if not relative.endswith(FINGERPRINTED):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            manifest[relative] = fingerprint(relative, body)
+            write_variants(os.path.join(out, manifest[relative]), body)
+
+    # index.html refers to assets as "static/<path>"
+    with open(os.path.join(src, "index.html")) as f:
+        html = f.read()
+    for relative in manifest:
+        html = re.sub(rf'(["\'])static/{re.escape(relative)}\1', rf'\1static/{manifest[relative]}\1', html)
+    write_variants(os.path.join(out, "index.html"), html.encode())
+
+    with open(os.path.join(out, ASSET_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    if brotli is None:
+        logger.warning("brotli is not installed, only gzip variants were written")
+    logger.info(f"Built {len(manifest)} fingerprinted assets into {out}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint and pre-compress the dashboard's static assets")
+    parser.add_argument("--src", default="static")
+    parser.add_argument("--out", default=os.environ.get("COVID_STATIC_BUILD", "static_build"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for original, hashed in build(args.src, args.out).items():
+        logger.info(f"{original} -> {hashed}")
+
+
+if __name__ == "__main__":
+    main()
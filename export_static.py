@@ -0,0 +1,167 @@
+"""
+Export every DataService response of a dataset as static files, so the dashboard can be served from a CDN
+
+    python export_static.py --out dist [--csv owid-covid-data.csv] [--workers 8]
+
+dist/<dataset version>/ gets one pre-serialized JSON file per response, each with a gzip copy
+next to it, and dist/manifest.json (written last) points the dashboard at the newest version.
+A copy of the dashboard configured to read the export is written to dist/ as well.
+"""
+from backend.services.data_service import DataService
+from backend.routers.formats import encode_json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+# Exported file of each response, relative to the version directory
+ROUTES = {
+    "timeseries": "timeseries.json",
+    "stats": "stats.json",
+    "map_data": "map-data/{date}.json",
+    "global_stats": "global-stats/{date}.json",
+    "top_countries": "top-countries/{date}.json",
+    "country": "country/{code}.json",
+}
+
+# DataService and output directory of each pool worker
+_service: Optional[DataService] = None
+_root: Optional[str] = None
+
+# (path relative to the version directory, bytes, gzip bytes)
+FileEntry = Tuple[str, int, int]
+
+
+def _init_worker(csv_path: str, root: str):
+    global _service, _root
+    # Workers only report problems; the parent logs progress
+    logging.disable(logging.INFO)
+    # The parent has published the shared store, so this attaches to it instead of rebuilding
+    _service = DataService(csv_path)
+    _root = root
+
+
+def _write(relative: str, payload: Dict) -> FileEntry:
+    """Write a response and its gzip copy; gzip's mtime is fixed so unchanged files stay byte-identical"""
+    body = encode_json(payload)
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    path = os.path.join(_root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+    with open(f"{path}.gz", "wb") as f:
+        f.write(compressed)
+    return relative, len(body), len(compressed)
+
+
+def _render_dates(dates: List[str]) -> List[FileEntry]:
+    """Map frame, global stats and top lists of each date"""
+    files = []
+    for date in dates:
+        files.append(_write(ROUTES["map_data"].format(date=date), _service.get_map_columns(date)))
+        files.append(_write(ROUTES["global_stats"].format(date=date), _service.get_global_stats(date)))
+        files.append(_write(ROUTES["top_countries"].format(date=date), _service.get_top_countries(date)))
+    return files
+
+
+def _render_countries(codes: List[str]) -> List[FileEntry]:
+    """Full daily history of each country"""
+    first, last = _service.date_strings[0], _service.date_strings[-1]
+    return [
+        _write(ROUTES["country"].format(code=code), _service.get_country_data(code, start=first, end=last))
+        for code in codes
+    ]
+
+
+def _render_summary() -> List[FileEntry]:
+    return [
+        _write(ROUTES["timeseries"], {"dates": _service.get_dates()}),
+        _write(ROUTES["stats"], _service.get_range_stats()),
+    ]
+
+
+def _chunks(items: List[str], count: int) -> List[List[str]]:
+    size = max(1, -(-len(items) // count))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def export(csv_path: str, out_dir: str, workers: int = os.cpu_count() or 1) -> Dict:
+    """Render every response of the dataset into out_dir/<version>/ and return the manifest"""
+    started = time.perf_counter()
+    service = DataService(csv_path)
+    root = os.path.join(out_dir, service.version)
+    os.makedirs(root, exist_ok=True)
+    logger.info(f"Exporting dataset {service.version} to {root} with {workers} workers")
+
+    # Several chunks per worker keep the pool busy when some dates or countries take longer
+    date_chunks = _chunks(service.date_strings, workers * 4)
+    code_chunks = _chunks(service.iso_codes, workers * 4)
+    files: List[FileEntry] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(csv_path, root)) as pool:
+        jobs = [pool.submit(_render_summary)]
+        jobs += [pool.submit(_render_dates, chunk) for chunk in date_chunks]
+        jobs += [pool.submit(_render_countries, chunk) for chunk in code_chunks]
+        for job in jobs:
+            files.extend(job.result())
+
+    manifest = {
+        "version": service.version,
+        "base": service.version,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "routes": ROUTES,
+        "encodings": ["gzip"],
+        "dates": service.date_strings,
+        "countries": dict(zip(service.countries, service.iso_codes)),
+        "files": len(files),
+        "bytes": sum(size for _, size, _ in files),
+        "gzip_bytes": sum(size for _, _, size in files),
+    }
+    with open(os.path.join(root, "manifest.json"), "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+    # Swap the top-level manifest last, so clients only see a version once all its files exist
+    tmp_path = os.path.join(out_dir, f"manifest.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(out_dir, "manifest.json"))
+    logger.info(
+        f"Exported {manifest['files']} files ({manifest['bytes'] / 1e6:.1f} MB, "
+        f"{manifest['gzip_bytes'] / 1e6:.1f} MB gzipped) in {time.perf_counter() - started:.1f}s"
+    )
+    return manifest
+
+
+def copy_dashboard(out_dir: str, static_dir: str = "static"):
+    """Copy the dashboard next to the export, pointed at its manifest instead of the API"""
+    shutil.copytree(static_dir, os.path.join(out_dir, "static"), dirs_exist_ok=True)
+    with open(os.path.join(static_dir, "index.html")) as f:
+        html = f.read()
+    html = html.replace('<meta name="covid-static-base" content="">', '<meta name="covid-static-base" content=".">')
+    with open(os.path.join(out_dir, "index.html"), "w") as f:
+        f.write(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the API responses of a dataset as static files")
+    parser.add_argument("--csv", default=os.environ.get("COVID_DATA_PATH", "owid-covid-data.csv"))
+    parser.add_argument("--out", default="dist", help="Directory receiving the versioned export")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Rendering processes")
+    parser.add_argument("--no-dashboard", action="store_true", help="Only export the data, not the dashboard")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    export(args.csv, args.out, args.workers)
+    if not args.no_dashboard:
+        copy_dashboard(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 # main.py (minimal backend to support COVID-19 map)
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 from backend.routers import covid_router
+from backend.metrics import metrics
+from backend.static_assets import PrecompressedStaticFiles, load_asset_manifest
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -14,7 +19,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="COVID-19 Dashboard API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bind the port immediately and load the dataset in the background; data routes answer 503 until ready
+    load_task = asyncio.create_task(covid_router.loader.load(covid_router.executor))
+    covid_router.reloader.start()
+    yield
+    load_task.cancel()
+    await covid_router.reloader.stop()
+    covid_router.executor.shutdown()
+
+app = FastAPI(title="COVID-19 Dashboard API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -25,13 +40,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Record per-route latency, request counts and payload sizes
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    # Label by route template, not the raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.inc("covid_http_requests_total", method=request.method, route=path, status=str(response.status_code))
+    metrics.observe("covid_http_request_duration_seconds", elapsed, method=request.method, route=path)
+    if "content-length" in response.headers:
+        metrics.observe("covid_http_response_size_bytes", int(response.headers["content-length"]), route=path)
+    return response
+
+metrics.gauge("covid_response_cache_entries", lambda: len(covid_router.response_cache), "Serialized responses held in the cache")
+metrics.counter("covid_response_cache_hits_total", lambda: covid_router.response_cache.hits, "Response cache hits")
+metrics.counter("covid_response_cache_misses_total", lambda: covid_router.response_cache.misses, "Response cache misses")
+metrics.counter("covid_response_cache_coalesced_total", lambda: covid_router.response_cache.coalesced, "Cache misses that waited for an identical in-flight computation")
+metrics.gauge("covid_response_cache_inflight", lambda: covid_router.response_cache.inflight, "Responses being computed")
+metrics.gauge("covid_executor_pending", lambda: covid_router.executor.pending, "DataService calls in flight or queued")
+metrics.counter("covid_executor_rejected_total", lambda: covid_router.executor.rejected, "DataService calls rejected with 503")
+metrics.gauge("covid_playback_streams", lambda: covid_router.playback_streams, "Open server-sent playback streams")
+metrics.gauge("covid_dataset_ready", lambda: float(covid_router.executor.service is not None), "1 once the dataset is loaded")
+metrics.counter("covid_dataset_reloads_total", lambda: covid_router.reloader.reloads, "Datasets hot-swapped since startup")
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Expose metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Mount static files: the fingerprinted, pre-compressed build from build_assets.py when there is one
+STATIC_BUILD = os.environ.get("COVID_STATIC_BUILD", "static_build")
+if os.path.exists(os.path.join(STATIC_BUILD, "index.html")):
+    static_files = PrecompressedStaticFiles(directory=STATIC_BUILD, immutable=load_asset_manifest(STATIC_BUILD).values())
+else:
+    static_files = StaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
 
-# Root route to serve the dashboard
+# Root route to serve the dashboard; it names the current assets, so it is always revalidated
 @app.get("/")
-async def read_root():
-    return FileResponse("static/index.html")
+async def read_root(request: Request):
+    return await static_files.get_response("index.html", request.scope)
 
 # Include routers
 app.include_router(covid_router.router, prefix="/api")
@@ -39,4 +91,5 @@ app.include_router(covid_router.router, prefix="/api")
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting COVID-19 Dashboard API server...")
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    # Every worker process memory-maps the same shared dataset instead of loading its own copy
+    uvicorn.run("main:app", host="0.0.0.0", port=3000, workers=int(os.environ.get("COVID_WORKERS", "1")))
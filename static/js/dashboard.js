@@ -1,8 +1,19 @@
 const API_BASE = 'http://localhost:3000';
+// Directory of a static export to read instead of the API (empty to use the API)
+const STATIC_BASE = document.querySelector('meta[name="covid-static-base"]')?.content || '';
+let staticManifest = null;
 let worldMap, currentDate, dates = [];
 let currentMapData = null;
 let zoomLevel = 1;
 let mapInitialized = false;
+let playback = null;
+const PLAYBACK_INTERVAL = 300; // ms between frames during playback
+const FRAME_CACHE_SIZE = 120; // decoded frames kept in memory
+const PREFETCH_AHEAD = 3; // dates fetched ahead of the one on screen while idle
+const PERSIST_FRAMES = true; // also keep frames in IndexedDB across page loads
+let datasetVersion = null; // frames are cached per dataset version
+let frameCache = null;
+const frameRequests = new Map(); // date -> in-flight frame fetch
 let darkMode = localStorage.getItem('darkMode') === 'enabled';
 
 // Initialize any saved user preferences
@@ -423,7 +434,7 @@ function animateNumbers(elementId, targetNumber) {
 // Load dates for timeline with improved UX
 async function loadDates() {
     try {
-        const data = await fetchWithError(`${API_BASE}/api/timeseries`);
+        const data = await fetchWithError(STATIC_BASE ? staticUrl('timeseries') : `${API_BASE}/api/timeseries`);
         dates = data.dates;
         
         // Set up date picker
@@ -445,6 +456,7 @@ async function loadDates() {
 
         // Add event listeners for timeline controls
         datePicker.addEventListener('change', async (e) => {
+            stopPlayback();
             const selectedDate = e.target.value;
             if (dates.includes(selectedDate)) {
                 currentDate = selectedDate;
@@ -454,6 +466,7 @@ async function loadDates() {
 
         // Previous date button
         document.getElementById('prev-date').addEventListener('click', async () => {
+            stopPlayback();
             const currentIndex = dates.indexOf(currentDate);
             if (currentIndex > 0) {
                 currentDate = dates[currentIndex - 1];
@@ -464,6 +477,7 @@ async function loadDates() {
 
         // Next date button
         document.getElementById('next-date').addEventListener('click', async () => {
+            stopPlayback();
             const currentIndex = dates.indexOf(currentDate);
             if (currentIndex < dates.length - 1) {
                 currentDate = dates[currentIndex + 1];
@@ -472,6 +486,9 @@ async function loadDates() {
             }
         });
 
+        // Play/pause button
+        document.getElementById('play-timeline').addEventListener('click', togglePlayback);
+
         // Update button states initially
         updateButtonStates();
 
@@ -506,21 +523,23 @@ async function loadMapData(date) {
             date = closestDate;
         }
         
-        // Get map data
-        const data = await fetchWithError(`${API_BASE}/api/map-data/${formattedDate}`);
-        currentMapData = data;
+        // The timeline handlers update currentDate before calling us, so compare with the frame on screen
+        const shownDate = currentMapData && currentMapData.date;
+        const direction = shownDate ? Math.sign(dates.indexOf(formattedDate) - dates.indexOf(shownDate)) || 1 : 1;
+
+        // A frame carries both the map data and the global stats; it comes from the cache (earlier views,
+        // prefetching, playback) or is fetched as a delta of the frame on screen
+        const frame = await getFrame(formattedDate, currentMapData);
+        currentMapData = frame;
         currentDate = formattedDate;
         
         // Update map visualization
-        await updateMap(data);
-        
-        // Get global stats
-        const globalStats = await fetchWithError(`${API_BASE}/api/global-stats?date=${formattedDate}`);
+        await updateMap(frame);
         
         // Update global stats
-        document.getElementById('total-cases').textContent = globalStats.total_cases.toLocaleString();
-        document.getElementById('total-deaths').textContent = globalStats.total_deaths.toLocaleString();
-        document.getElementById('total-countries').textContent = globalStats.total_countries;
+        document.getElementById('total-cases').textContent = frame.total_cases.toLocaleString();
+        document.getElementById('total-deaths').textContent = frame.total_deaths.toLocaleString();
+        document.getElementById('total-countries').textContent = frame.total_countries;
         
         // Update date display with formatted date
         document.getElementById('current-date').textContent = formatDate(formattedDate);
@@ -528,6 +547,9 @@ async function loadMapData(date) {
         
         // Update button states
         updateButtonStates();
+
+        // Fetch the next dates in the direction the user is moving while the browser is idle
+        if (!playback || !playback.source) schedulePrefetch(formattedDate, direction);
         
     } catch (error) {
         console.error('Error loading map data:', error);
@@ -535,6 +557,257 @@ async function loadMapData(date) {
     }
 }
 
+// Bounded LRU of decoded frames for one dataset version, backed by IndexedDB when the browser allows it
+class FrameCache {
+    constructor(version, capacity) {
+        this.version = version;
+        this.capacity = capacity;
+        this.frames = new Map();
+        this.db = null;
+    }
+
+    // Open the persistent tier and drop frames stored for other dataset versions
+    async open() {
+        if (!PERSIST_FRAMES || !window.indexedDB || !this.version) return this;
+        try {
+            this.db = await new Promise((resolve, reject) => {
+                const request = indexedDB.open('covid-dashboard', 1);
+                request.onupgradeneeded = () => {
+                    request.result.createObjectStore('frames').createIndex('version', 'version');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+            const store = this.db.transaction('frames', 'readwrite').objectStore('frames');
+            store.openCursor().onsuccess = event => {
+                const cursor = event.target.result;
+                if (!cursor) return;
+                if (cursor.value.version !== this.version) cursor.delete();
+                cursor.continue();
+            };
+        } catch (error) {
+            console.warn('Frame cache persistence unavailable:', error);
+            this.db = null;
+        }
+        return this;
+    }
+
+    async get(date) {
+        const frame = this.frames.get(date);
+        if (frame) {
+            this.frames.delete(date);
+            this.frames.set(date, frame);
+            return frame;
+        }
+        if (!this.db) return null;
+        const stored = await new Promise(resolve => {
+            const request = this.db.transaction('frames').objectStore('frames').get(`${this.version}/${date}`);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(null);
+        });
+        if (!stored) return null;
+        this.remember(date, stored.frame);
+        return stored.frame;
+    }
+
+    set(date, frame) {
+        this.remember(date, frame);
+        if (this.db) {
+            try {
+                this.db.transaction('frames', 'readwrite').objectStore('frames')
+                    .put({ version: this.version, frame }, `${this.version}/${date}`);
+            } catch (error) {
+                console.warn('Could not persist frame:', error);
+            }
+        }
+    }
+
+    remember(date, frame) {
+        this.frames.delete(date);
+        this.frames.set(date, frame);
+        while (this.frames.size > this.capacity) {
+            this.frames.delete(this.frames.keys().next().value);
+        }
+    }
+}
+
+// Frame for a date from the cache, otherwise fetched once however many callers ask for it concurrently
+async function getFrame(date, base = null, retries = 2) {
+    const cached = await frameCache.get(date);
+    if (cached) return cached;
+    let request = frameRequests.get(date);
+    if (!request) {
+        request = fetchFrame(date, base, retries)
+            .then(frame => {
+                frameCache.set(date, frame);
+                return frame;
+            })
+            .finally(() => frameRequests.delete(date));
+        frameRequests.set(date, request);
+    }
+    return request;
+}
+
+// Fetch a frame: a delta patching the base frame when there is one, else the full map data and global stats
+async function fetchFrame(date, base, retries) {
+    if (STATIC_BASE) {
+        const [map, stats] = await Promise.all([
+            fetchWithError(staticUrl('map_data', { date }), retries),
+            fetchWithError(staticUrl('global_stats', { date }), retries)
+        ]);
+        return { ...stats, ...decodeColumnar(map) };
+    }
+    // Versioned URLs let the browser cache dated responses as immutable
+    const version = datasetVersion ? `&v=${datasetVersion}` : '';
+    if (base && base.date && base.date !== date) {
+        const delta = await fetchWithError(`${API_BASE}/api/map-data/${date}/delta?base=${base.date}${version}`, retries);
+        return applyDelta(base, delta);
+    }
+    const [map, stats] = await Promise.all([
+        fetchWithError(`${API_BASE}/api/map-data/${date}?format=columnar${version}`, retries),
+        fetchWithError(`${API_BASE}/api/global-stats?date=${date}${version}`, retries)
+    ]);
+    return { ...stats, ...decodeColumnar(map) };
+}
+
+// Prefetch the dates following `date` in `direction` once the browser is idle, each as a delta of the one before
+function schedulePrefetch(date, direction) {
+    const idle = window.requestIdleCallback || (callback => setTimeout(callback, 200));
+    idle(async () => {
+        let base = await frameCache.get(date);
+        for (let i = 1; i <= PREFETCH_AHEAD && base; i++) {
+            const next = dates[dates.indexOf(date) + i * direction];
+            if (!next || currentDate !== date) return;
+            try {
+                base = await getFrame(next, base, 0);
+            } catch (error) {
+                return; // prefetching is best effort
+            }
+        }
+    });
+}
+
+// Expand a columnar map payload (one array per field) into the per-country objects the map code uses
+function decodeColumnar(payload) {
+    const { columns, ...rest } = payload;
+    const fields = Object.keys(columns);
+    const count = fields.length ? columns[fields[0]].length : 0;
+    const countries = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const country = {};
+        for (const field of fields) country[field] = columns[field][i];
+        countries[i] = country;
+    }
+    return { ...rest, countries };
+}
+
+// Apply a map delta to the frame of its base date: drop removed countries, upsert changed ones and rescale severity
+function applyDelta(base, delta) {
+    const { countries: changed, removed, scale, base: baseDate, ...totals } = decodeColumnar(delta);
+    const byCode = new Map(base.countries.map(country => [country.iso_code, country]));
+    removed.forEach(code => byCode.delete(code));
+    changed.forEach(country => byCode.set(country.iso_code, country));
+
+    const countries = Array.from(byCode.values(), country => ({
+        ...country,
+        severity: scale > 0 ? country.cases_per_million / scale * 100 : 0
+    }));
+    countries.sort((a, b) => b.severity - a.severity);
+    return { ...totals, countries };
+}
+
+// Play the timeline from the current date over one server-sent event stream; the server paces the frames
+function togglePlayback() {
+    if (playback) {
+        stopPlayback();
+        return;
+    }
+
+    let next = dates.indexOf(currentDate) + 1;
+    if (next >= dates.length) next = 0;
+
+    if (STATIC_BASE) {
+        playStaticFrames(next);
+        return;
+    }
+
+    const speed = 1000 / PLAYBACK_INTERVAL;
+    const source = new EventSource(`${API_BASE}/api/playback?from=${dates[next]}&to=${dates[dates.length - 1]}&speed=${speed}`);
+    playback = { source, latest: null, rendering: false, ended: false };
+    setPlayButton(true);
+
+    // Render the newest frame received; frames that arrive while one is rendering replace each other
+    const render = async () => {
+        const current = playback;
+        current.rendering = true;
+        while (playback === current && current.latest) {
+            const date = current.latest;
+            current.latest = null;
+            currentDate = date;
+            await loadMapData(date);
+        }
+        current.rendering = false;
+        if (playback === current && current.ended) stopPlayback();
+    };
+
+    source.addEventListener('frame', event => {
+        const frame = decodeColumnar(JSON.parse(event.data));
+        frameCache.set(frame.date, frame);
+        playback.latest = frame.date;
+        if (!playback.rendering) render();
+    });
+    // Let the last frame finish rendering before resetting the play button
+    source.addEventListener('end', () => {
+        source.close();
+        playback.ended = true;
+        if (!playback.rendering) stopPlayback();
+    });
+    source.addEventListener('unavailable', event => {
+        console.error('Playback stream unavailable:', JSON.parse(event.data));
+        showError('The server is busy, playback stopped.');
+        stopPlayback();
+    });
+    // EventSource reconnects by itself (resuming after the last frame); only give up once it is closed
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            showError('Failed to load timeline frames.');
+            stopPlayback();
+        }
+    };
+}
+
+// Without a backend to push frames, step through the exported ones on a timer
+function playStaticFrames(next) {
+    const current = playback = { source: null, timer: null };
+    setPlayButton(true);
+
+    const step = async () => {
+        await loadMapData(dates[next]);
+        next += 1;
+        if (playback !== current) return;
+        if (next >= dates.length) {
+            stopPlayback();
+            return;
+        }
+        current.timer = setTimeout(step, PLAYBACK_INTERVAL);
+    };
+    step();
+}
+
+function stopPlayback() {
+    if (!playback) return;
+    if (playback.source) playback.source.close();
+    clearTimeout(playback.timer);
+    playback = null;
+    setPlayButton(false);
+}
+
+function setPlayButton(playing) {
+    const button = document.getElementById('play-timeline');
+    button.innerHTML = playing ? '<i class="fas fa-pause"></i>' : '<i class="fas fa-play"></i>';
+    button.title = playing ? 'Pause' : 'Play';
+}
+
 // Enhanced fetch with error handling, retries, and timeout
 async function fetchWithError(url, retries = 2, timeout = 10000) {
     let attempts = 0;
@@ -588,9 +861,45 @@ async function fetchWithError(url, retries = 2, timeout = 10000) {
     }
 }
 
+// Wait for the backend to finish loading its dataset, polling the readiness probe
+async function waitUntilReady(maxWait = 300000) {
+    const deadline = Date.now() + maxWait;
+    while (Date.now() < deadline) {
+        const response = await fetch(`${API_BASE}/api/health/ready`, {
+            method: 'GET',
+            headers: { 'Accept': 'application/json' },
+            mode: 'cors',
+            credentials: 'omit'
+        });
+        if (response.ok) {
+            datasetVersion = (await response.json()).version;
+            return true;
+        }
+        if (response.status !== 503) return false;
+
+        const status = await response.json();
+        if (status.phase === 'failed') return false;
+        console.log(`Waiting for backend data: ${status.phase} (${Math.round(status.progress * 100)}%)`);
+        const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+    return false;
+}
+
 // Test backend connection with improved UI feedback
 async function testBackend() {
     try {
+        showLoading();
+        let ready;
+        try {
+            ready = await waitUntilReady();
+        } finally {
+            hideLoading();
+        }
+        if (!ready) {
+            throw new Error('Backend data did not finish loading');
+        }
+
         const response = await fetch(`${API_BASE}/api/test`, {
             method: 'GET',
             headers: { 'Accept': 'application/json' },
@@ -616,6 +925,25 @@ async function testBackend() {
     }
 }
 
+// Load the manifest of a static export; its routes map each response to a file
+async function loadStaticExport() {
+    try {
+        staticManifest = await fetchWithError(`${STATIC_BASE}/manifest.json`);
+        datasetVersion = staticManifest.version;
+        return true;
+    } catch (error) {
+        console.error('Static export unavailable:', error);
+        showError(`Could not load the static export at ${STATIC_BASE}/manifest.json`);
+        return false;
+    }
+}
+
+// URL of the exported file standing in for an API response
+function staticUrl(route, params = {}) {
+    const path = staticManifest.routes[route].replace(/\{(\w+)\}/g, (_, key) => encodeURIComponent(params[key]));
+    return `${STATIC_BASE}/${staticManifest.base}/${path}`;
+}
+
 // Handle window resize
 function handleResize() {
     if (mapInitialized) {
@@ -635,10 +963,11 @@ async function init() {
         window.addEventListener('resize', handleResize);
         
         // Test backend connection
-        const isBackendRunning = await testBackend();
+        const isBackendRunning = STATIC_BASE ? await loadStaticExport() : await testBackend();
         if (!isBackendRunning) {
             return;
         }
+        frameCache = await new FrameCache(datasetVersion, FRAME_CACHE_SIZE).open();
         
         // Load map if it hasn't been initialized
         if (!mapInitialized) {